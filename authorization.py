@@ -2,19 +2,30 @@
 Role-based authorization helpers
 """
 from typing import Optional
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Request
 
 from auth import AuthUser, get_current_user
 from database import get_user_profile, Profile, UserRole
 
+# UserRole values are plain strings, so role checks are direct str comparisons
+TEACHER_OR_ADMIN_ROLES = frozenset({UserRole.TEACHER, UserRole.ADMIN})
+
 
 async def require_profile(
+    request: Request,
     user: AuthUser = Depends(get_current_user)
 ) -> Profile:
     """
     Get the full profile for the authenticated user.
     Raises 404 if profile doesn't exist.
+
+    The profile is memoised on request.state so every dependency in the
+    same request shares a single database lookup.
     """
+    profile = getattr(request.state, "profile", None)
+    if profile is not None and profile.id == user.user_id:
+        return profile
+
     profile = await get_user_profile(user.user_id)
     
     if not profile:
@@ -23,6 +34,7 @@ async def require_profile(
             detail="User profile not found. Please contact your administrator."
         )
     
+    request.state.profile = profile
     return profile
 
 
@@ -69,6 +81,6 @@ async def require_student(profile: Profile = Depends(require_profile)) -> Profil
 
 async def require_teacher_or_admin(profile: Profile = Depends(require_profile)) -> Profile:
     """Require teacher or admin role"""
-    if profile.role not in [UserRole.TEACHER, UserRole.ADMIN]:
+    if profile.role not in TEACHER_OR_ADMIN_ROLES:
         raise HTTPException(status_code=403, detail="Teacher or Admin access required")
     return profile
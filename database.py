@@ -2,6 +2,7 @@
 Database utilities using Supabase REST API client
 """
 from typing import Optional
+from cachetools import TTLCache
 from pydantic import BaseModel
 from datetime import datetime
 from dotenv import load_dotenv
@@ -47,21 +48,36 @@ class Profile(BaseModel):
         from_attributes = True
 
 
+# Short-lived cache of profiles by user id; profile rows rarely change mid-session
+_profile_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+
+
 # Utility functions
 async def get_user_profile(user_id: str) -> Optional[Profile]:
-    """Get user profile from database"""
+    """Get user profile from database (cached for up to 60 seconds)"""
+    cached = _profile_cache.get(user_id)
+    if cached is not None:
+        return cached
+
     try:
         query = supabase_client.query("profiles")
         result = await query.select("*").eq("id", user_id).execute()
 
         if result["data"] and len(result["data"]) > 0:
-            return Profile(**result["data"][0])
+            profile = Profile(**result["data"][0])
+            _profile_cache[user_id] = profile
+            return profile
         return None
     except Exception as e:
         print(f"Error fetching profile: {e}")
         return None
 
 
+def invalidate_user_profile(user_id: str) -> None:
+    """Drop a cached profile after it is updated or deleted"""
+    _profile_cache.pop(user_id, None)
+
+
 async def upsert_assessment_result(
     user_id: str,
     school_id: str,
@@ -0,0 +1,90 @@
+"""
+Coalescing loaders
+Lookups issued concurrently (within one event-loop tick) are answered by a single query,
+and identical in-flight calls wrapped with @coalesce share one result
+"""
+import asyncio
+import functools
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Set, Tuple
+
+from supabase_client import supabase_client
+
+
+def coalesce(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Share one in-flight call among concurrent callers passing the same (hashable) positional arguments.
+    Nothing is cached: once the call finishes, the next caller runs it again. Callers must not mutate the result.
+    """
+    inflight: Dict[Tuple, asyncio.Future] = {}
+
+    @functools.wraps(fn)
+    async def wrapper(*args):
+        future = inflight.get(args)
+        if future is None:
+            future = inflight[args] = asyncio.ensure_future(fn(*args))
+            future.add_done_callback(lambda _: inflight.pop(args, None))
+        # Shield so one cancelled caller doesn't cancel the call for the others
+        return await asyncio.shield(future)
+
+    return wrapper
+
+
+class StudentOwnershipLoader:
+    """
+    Answers "is this profile in this school?" for admin student routes.
+    Checks queued in the same tick for a school share one profiles `id=in.(...)` query.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Dict[str, asyncio.Future]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, school_id: str, student_id: str) -> bool:
+        """True if `student_id` is a profile in `school_id`"""
+        try:
+            uuid.UUID(student_id)
+        except ValueError:
+            # Would make PostgREST reject the whole batch
+            return False
+
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(school_id)
+        if batch is None:
+            batch = self._pending[school_id] = {}
+            loop.call_soon(self._dispatch, school_id)
+
+        future = batch.get(student_id)
+        if future is None:
+            future = batch[student_id] = loop.create_future()
+        # Shield so one cancelled caller doesn't cancel the result for the others
+        return await asyncio.shield(future)
+
+    def _dispatch(self, school_id: str):
+        task = asyncio.ensure_future(self._fetch(school_id, self._pending.pop(school_id)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _fetch(school_id: str, batch: Dict[str, asyncio.Future]):
+        try:
+            result = await supabase_client.query("profiles") \
+                .select("id") \
+                .in_("id", list(batch)) \
+                .eq("school_id", school_id) \
+                .execute()
+            if result.get("error"):
+                raise Exception(result["error"])
+            found = {row["id"] for row in result["data"]}
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for student_id, future in batch.items():
+            if not future.done():
+                future.set_result(student_id in found)
+
+
+student_ownership = StudentOwnershipLoader()
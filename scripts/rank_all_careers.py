@@ -1,15 +1,29 @@
+from functools import lru_cache
+
 from models.user_profile import UserProfile
 from ingestion.build_career_profiles import build_all_career_profiles
 from ingestion.read_occupation_data import load_soc_title_mapping
 from matching.engine import match_user_to_role
 
+# The O*NET inputs are static, so build them once per process rather than re-reading the CSVs per ranking.
+# Matchers only read the profiles; callers must not mutate them.
+@lru_cache(maxsize=1)
+def cached_career_profiles():
+    return build_all_career_profiles()
+
+
+@lru_cache(maxsize=1)
+def cached_soc_titles():
+    return load_soc_title_mapping()
+
+
 def rank_profiles(user_profile):
     user = UserProfile(psychometrics=user_profile)
 
     # Build all career profiles
-    career_profiles = build_all_career_profiles()
+    career_profiles = cached_career_profiles()
 
-    socs = load_soc_title_mapping()
+    socs = cached_soc_titles()
 
     results = {}
     rank_list = []
@@ -0,0 +1,56 @@
+"""
+Test script for reading stored analyses back for the frontend.
+Run from CareersAI directory: python scripts/test_analysis_mapping.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# server.py builds its Supabase client at import; no requests are made here
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_SECRET_KEY", "test")
+
+from server import _map_analysis_for_frontend
+
+
+WEIGHTING = {"assessment": 0.6, "teacher_comments": 0.3, "subjects": 0.1}
+
+
+def test_legacy_weighting_explanation() -> bool:
+    """A row stored before the jsonb migration holds weighting_explanation as a JSON string"""
+    legacy_row = {"weighting_explanation": '{"assessment": 0.6, "teacher_comments": 0.3, "subjects": 0.1}'}
+    mapped = _map_analysis_for_frontend(legacy_row)
+    passed = mapped["weighting_explanation"] == WEIGHTING
+    print(f"[{'PASS' if passed else 'FAIL'}] Legacy string row reads back as: {mapped['weighting_explanation']!r}")
+    return passed
+
+
+def test_jsonb_weighting_explanation() -> bool:
+    """Rows stored as jsonb come back unchanged"""
+    mapped = _map_analysis_for_frontend({"weighting_explanation": dict(WEIGHTING)})
+    passed = mapped["weighting_explanation"] == WEIGHTING
+    print(f"[{'PASS' if passed else 'FAIL'}] jsonb row reads back as: {mapped['weighting_explanation']!r}")
+    return passed
+
+
+def test_missing_weighting_explanation() -> bool:
+    """Rows without a weighting explanation stay None"""
+    mapped = _map_analysis_for_frontend({"weighting_explanation": None})
+    passed = mapped["weighting_explanation"] is None
+    print(f"[{'PASS' if passed else 'FAIL'}] Missing weighting reads back as: {mapped['weighting_explanation']!r}")
+    return passed
+
+
+if __name__ == "__main__":
+    results = [
+        test_legacy_weighting_explanation(),
+        test_jsonb_weighting_explanation(),
+        test_missing_weighting_explanation(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("ALL TESTS PASSED")
+    else:
+        print("SOME TESTS FAILED")
+    print("=" * 60)
@@ -2,22 +2,28 @@
 FastAPI application for LaunchPad School Career Guidance System
 Uses Supabase REST API (no pyroaring dependency)
 """
-import os
+import asyncio
+import uuid
 from dotenv import load_dotenv
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
+from cachetools import TTLCache
 from pydantic import BaseModel
 
 # Internal imports
 from auth import get_current_user, AuthUser
 from authorization import require_admin, require_teacher, require_student, require_profile
-from database import get_user_profile, upsert_assessment_result, Profile, UserRole
+from database import invalidate_user_profile, upsert_assessment_result, Profile, UserRole
+from responses import (
+    ORJSONResponse, etag_response, etag_response_in_thread, not_modified, versioned_response, weak_etag
+)
+from loaders import coalesce, student_ownership
 from supabase_client import supabase_client
 
 # Import existing matching logic
-from scripts.rank_all_careers import rank_profiles
+from scripts.rank_all_careers import cached_career_profiles, rank_profiles
 from inference.answer_converter import convert_answers_to_profile
 
 # AI analysis engine (single comprehensive prompt)
@@ -32,15 +38,30 @@ from ai.llm_client import generate_text, analyse as llm_analyse
 
 from datetime import datetime, UTC
 import time
-import traceback
 import csv
 import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
 
 import httpx
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def stage(name: str, timings: Dict[str, float]):
+    """Record the wall time of a block into `timings[name]` (seconds, perf_counter)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
 # ============================================================================
 # O*NET SOC TITLE CACHE (loaded once at startup)
 # ============================================================================
@@ -57,10 +78,56 @@ def load_soc_title_mapping() -> list[tuple[str, str, str]]:
             entries.append((code, title, title.lower()))
     return entries
 
+def build_ngram_index(titles: Sequence[str], n: int) -> dict[str, list[int]]:
+    """Map every n-gram to the ascending, de-duplicated list of title indices containing it."""
+    index: dict[str, list[int]] = defaultdict(list)
+    for i, title in enumerate(titles):
+        for gram in {title[j:j + n] for j in range(len(title) - n + 1)}:
+            index[gram].append(i)
+    return dict(index)
+
+
 SOC_INDEX = load_soc_title_mapping()
-SOC_CODES_SET = {code for code, _, _ in SOC_INDEX}
+# Parallel arrays (index i is the same occupation) so scans only touch the column they need
+SOC_CODES = tuple(code for code, _, _ in SOC_INDEX)
+SOC_TITLES = tuple(title for _, title, _ in SOC_INDEX)
+SOC_TITLES_LOWER = tuple(title_lower for _, _, title_lower in SOC_INDEX)
+TITLE_BY_SOC_CODE = dict(zip(SOC_CODES, SOC_TITLES))
+# Postings lists for substring search: 3-grams for normal queries, 2-grams for the minimum-length query
+TRIGRAM_INDEX = build_ngram_index(SOC_TITLES_LOWER, 3)
+BIGRAM_INDEX = build_ngram_index(SOC_TITLES_LOWER, 2)
 print(f"Loaded {len(SOC_INDEX)} O*NET occupations into search index")
-app = FastAPI(title="LaunchPad Career Guidance API", version="2.0.0")
+
+
+# Supabase Auth admin API (create/delete users), shared so admin mutations reuse its connections
+AUTH_HTTP = httpx.AsyncClient(
+    base_url=f"{supabase_client.url}/auth/v1/admin",
+    headers={
+        "apikey": supabase_client.key,
+        "Authorization": f"Bearer {supabase_client.key}",
+    },
+    http2=True,
+    # Admin user changes are sporadic; keep idle connections well past httpx's 5s default
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+    timeout=10.0,
+)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Keep the pooled Supabase HTTP clients open for the lifetime of the app."""
+    # Build the career profiles up front so the first assessment doesn't pay for it
+    await asyncio.to_thread(cached_career_profiles)
+    yield
+    await asyncio.gather(supabase_client.close(), AUTH_HTTP.aclose())
+
+
+app = FastAPI(
+    title="LaunchPad Career Guidance API",
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # CORS configuration
 app.add_middleware(
@@ -191,6 +258,23 @@ class PortfolioData(BaseModel):
     skills: Optional[List[str]] = []
 
 
+# student_portfolios columns written by PUT /student/portfolio
+PORTFOLIO_COLUMNS = (
+    "student_id, summary, year_level, subjects, work_experience, certifications, "
+    "volunteering, extracurriculars, skills, updated_at"
+)
+
+
+# Question ids every assessment submission must answer
+REQUIRED_ASSESSMENT_IDS = frozenset(
+    [f"A{i}" for i in range(1, 6)] +
+    [f"I{i}" for i in range(1, 7)] +
+    [f"T{i}" for i in range(1, 7)] +
+    [f"V{i}" for i in range(1, 7)] +
+    [f"W{i}" for i in range(1, 5)]
+)
+
+
 HARD_CODED_SUBJECTS = [
     {"name": "English", "category": "Humanities"},
     {"name": "Maths", "category": "STEM"},
@@ -209,8 +293,29 @@ HARD_CODED_SUBJECTS = [
 ]
 
 
+# Seeded subject maps by school_id; the fixed list only changes with a deploy
+_subjects_cache: TTLCache = TTLCache(maxsize=1_000, ttl=300)
+_subjects_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
 async def ensure_hardcoded_subjects(school_id: str):
-    """Ensure fixed subject list exists for a school and return a name-indexed map."""
+    """
+    Ensure fixed subject list exists for a school and return a name-indexed map.
+    Cached per school for 5 minutes; concurrent misses for a school share one seed.
+    """
+    cached = _subjects_cache.get(school_id)
+    if cached is not None:
+        return cached
+
+    async with _subjects_locks[school_id]:
+        cached = _subjects_cache.get(school_id)
+        if cached is None:
+            cached = _subjects_cache[school_id] = await _seed_hardcoded_subjects(school_id)
+        return cached
+
+
+async def _seed_hardcoded_subjects(school_id: str):
+    """Upsert the fixed subject list for a school and load its subjects by lower-cased name."""
     seed_rows = [
         {
             "school_id": school_id,
@@ -235,6 +340,11 @@ async def ensure_hardcoded_subjects(school_id: str):
 
     return existing_by_name
 
+async def _no_rows() -> dict:
+    """Stand-in for a query that would match nothing, for use in asyncio.gather."""
+    return {"data": [], "error": None}
+
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
@@ -260,19 +370,11 @@ async def guest_assessment(submission: AssessmentSubmission):
     answers = submission.answers
 
     # Validate answers
-    required_ids = (
-            [f"A{i}" for i in range(1, 6)] +
-            [f"I{i}" for i in range(1, 7)] +
-            [f"T{i}" for i in range(1, 7)] +
-            [f"V{i}" for i in range(1, 7)] +
-            [f"W{i}" for i in range(1, 5)]
-    )
-
-    missing = [qid for qid in required_ids if qid not in answers]
+    missing = REQUIRED_ASSESSMENT_IDS.difference(answers)
     if missing:
         raise HTTPException(
             status_code=400,
-            detail=f"Missing required questions: {', '.join(missing)}"
+            detail=f"Missing required questions: {', '.join(sorted(missing))}"
         )
 
     # Convert answers to psychometric profile
@@ -283,7 +385,7 @@ async def guest_assessment(submission: AssessmentSubmission):
 
     # Rank careers using the profile
     try:
-        _results, ranking = rank_profiles(user_psychometrics)
+        _results, ranking = await asyncio.to_thread(rank_profiles, user_psychometrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error ranking careers: {str(e)}")
 
@@ -303,58 +405,35 @@ async def guest_assessment(submission: AssessmentSubmission):
 @app.post("/student/assessment", response_model=AssessmentResponse)
 async def submit_assessment(
         submission: AssessmentSubmission,
-        user: AuthUser = Depends(get_current_user)
+        user: AuthUser = Depends(get_current_user),
+        profile: Profile = Depends(require_student)
 ):
     """Student submits assessment answers and gets career rankings"""
-    start_time = time.time()
-
-    try:
-        # Get user profile
-        profile = await get_user_profile(user.user_id)
-        if not profile:
-            raise HTTPException(status_code=404, detail="Profile not found")
-
-        # Verify student role
-        if profile.role != UserRole.STUDENT:
-            raise HTTPException(status_code=403, detail="Student access required")
+    timings: Dict[str, float] = {}
+    start_time = time.perf_counter()
 
-        answers = submission.answers
-        print(f"[TIMING] Profile fetch: {time.time() - start_time:.2f}s")
-    except Exception as e:
-        print(f"[ERROR] Initial setup failed: {str(e)}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Setup error: {str(e)}")
+    # Profile and student role are already resolved by require_student
+    answers = submission.answers
 
     # Validate answers
-    required_ids = (
-            [f"A{i}" for i in range(1, 6)] +
-            [f"I{i}" for i in range(1, 7)] +
-            [f"T{i}" for i in range(1, 7)] +
-            [f"V{i}" for i in range(1, 7)] +
-            [f"W{i}" for i in range(1, 5)]
-    )
-
-    missing = [qid for qid in required_ids if qid not in answers]
+    missing = REQUIRED_ASSESSMENT_IDS.difference(answers)
     if missing:
         raise HTTPException(
             status_code=400,
-            detail=f"Missing required questions: {', '.join(missing)}"
+            detail=f"Missing required questions: {', '.join(sorted(missing))}"
         )
 
     # Convert answers to psychometric profile
     try:
-        convert_start = time.time()
-        user_psychometrics = convert_answers_to_profile(answers)
-        print(f"[TIMING] Convert answers: {time.time() - convert_start:.2f}s")
+        with stage("convert_answers", timings):
+            user_psychometrics = convert_answers_to_profile(answers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error converting answers: {str(e)}")
 
     # Rank careers using the profile
     try:
-        rank_start = time.time()
-        print("[TIMING] Starting rank_profiles...")
-        _results, ranking = rank_profiles(user_psychometrics)
-        print(f"[TIMING] Rank careers: {time.time() - rank_start:.2f}s")
+        with stage("rank_careers", timings):
+            _results, ranking = await asyncio.to_thread(rank_profiles, user_psychometrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error ranking careers: {str(e)}")
 
@@ -363,25 +442,26 @@ async def submit_assessment(
 
     # Save to database
     try:
-        save_start = time.time()
-        success = await upsert_assessment_result(
-            user_id=profile.id,
-            school_id=profile.school_id,
-            raw_answers=answers,
-            ranking=ranking,
-            profile_data=profile_data,
-            user_token=user.token  # Pass user's token for RLS
-        )
-        print(f"[TIMING] Database save: {time.time() - save_start:.2f}s")
+        with stage("database_save", timings):
+            success = await upsert_assessment_result(
+                user_id=profile.id,
+                school_id=profile.school_id,
+                raw_answers=answers,
+                ranking=ranking,
+                profile_data=profile_data,
+                user_token=user.token  # Pass user's token for RLS
+            )
 
         if not success:
             raise HTTPException(status_code=500, detail="Failed to save assessment results")
     except Exception as e:
-        print(f"Assessment save error: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Assessment save failed for %s", profile.id)
         raise HTTPException(status_code=500, detail=f"Failed to save: {str(e)}")
 
-    print(f"[TIMING] Total time: {time.time() - start_time:.2f}s")
+    timings["total"] = time.perf_counter() - start_time
+    logger.info("assessment.timings=%s", timings)
+
+    invalidate_school_stats(profile.school_id)
 
     return AssessmentResponse(
         ranking=ranking,
@@ -489,9 +569,9 @@ async def get_student_portfolio(profile: Profile = Depends(require_student)):
                 .in_("id", class_ids)
                 .execute()
             )
-            subject_ids = list(set(
+            subject_ids = dict.fromkeys(
                 c["subject_id"] for c in classes_info.get("data", []) if c.get("subject_id")
-            ))
+            )
             if subject_ids:
                 subjects_result = (
                     await supabase_client.query("subjects")
@@ -606,10 +686,18 @@ async def search_careers(
     if not query or len(query) < 2:
         return {"results": []}
 
+    # Candidates come from the shortest postings list among the query's n-grams;
+    # lists are in SOC_INDEX order, so results match a linear scan.
+    if len(query) == 2:
+        candidates = BIGRAM_INDEX.get(query, [])
+    else:
+        postings = [TRIGRAM_INDEX.get(query[j:j + 3]) for j in range(len(query) - 2)]
+        candidates = [] if not all(postings) else min(postings, key=len)
+
     results = []
-    for code, title, title_lower in SOC_INDEX:
-        if query in title_lower:
-            results.append({"soc_code": code, "title": title})
+    for i in candidates:
+        if query in SOC_TITLES_LOWER[i]:
+            results.append({"soc_code": SOC_CODES[i], "title": SOC_TITLES[i]})
             if len(results) >= 10:
                 break
 
@@ -638,34 +726,25 @@ async def save_student_career_aspirations(
 ):
     """Replace the student's full career aspirations list."""
     try:
-        # Validate SOC codes against in-memory cache
-        invalid_codes = [c for c in request.soc_codes if c not in SOC_CODES_SET]
+        # Validate SOC codes against the in-memory cache while building the rows
+        rows = []
+        invalid_codes = []
+        for code in request.soc_codes:
+            title = TITLE_BY_SOC_CODE.get(code)
+            if title is None:
+                invalid_codes.append(code)
+            else:
+                rows.append({"student_id": profile.id, "soc_code": code, "title": title})
         if invalid_codes:
             raise HTTPException(status_code=400, detail=f"Invalid SOC codes: {', '.join(invalid_codes)}")
 
-        # Delete existing aspirations
-        await supabase_client.query("student_career_aspirations") \
-            .delete() \
-            .eq("student_id", profile.id) \
-            .execute()
-
-        # Insert new ones
-        if request.soc_codes:
-            # Build title lookup
-            title_by_code = {code: title for code, title, _ in SOC_INDEX}
-            rows = [
-                {
-                    "student_id": profile.id,
-                    "soc_code": code,
-                    "title": title_by_code[code],
-                }
-                for code in request.soc_codes
-            ]
-            result = await supabase_client.query("student_career_aspirations") \
-                .insert(rows) \
-                .execute()
-            if result.get("error"):
-                raise Exception(result["error"])
+        # Delete existing aspirations and insert the new ones in one transaction
+        result = await supabase_client.rpc(
+            "replace_student_aspirations",
+            {"_student": profile.id, "_rows": rows}
+        ).execute()
+        if result.get("error"):
+            raise Exception(result["error"])
 
         return {"message": "Career aspirations saved"}
     except HTTPException:
@@ -837,7 +916,7 @@ async def get_teacher_students(profile: Profile = Depends(require_teacher)):
             .execute()
         )
 
-        student_ids = list({s["student_id"] for s in students_result["data"]})
+        student_ids = dict.fromkeys(s["student_id"] for s in students_result["data"])
 
         if not student_ids:
             return {"students": []}
@@ -923,72 +1002,45 @@ async def get_teacher_student_detail(
     profile: Profile = Depends(require_teacher)
 ):
     """Teacher gets detailed student information for a student assigned to their class."""
-    print(f"\n[DEBUG] Teacher {profile.id} trying to access student {student_id}")
+    logger.debug("Teacher %s requesting student %s", profile.id, student_id)
     try:
-        # Verify student exists and belongs to the same school
-        print("[DEBUG] 1. Fetching student profile...")
-        student_profile_result = await supabase_client.query("profiles").select("*") \
-            .eq("id", student_id) \
-            .eq("school_id", profile.school_id) \
-            .execute()
-        print(f"[DEBUG]    ... Student profile result: {student_profile_result}")
+        # Fetch the student's profile and the teacher's classes that include this
+        # student (teacher_student_classes view) concurrently
+        student_profile_result, teacher_student_classes_result = await asyncio.gather(
+            supabase_client.query("profiles").select("*")
+            .eq("id", student_id)
+            .eq("school_id", profile.school_id)
+            .execute(),
+            supabase_client.query("teacher_student_classes")
+            .select("class_id, class_name, subject_name")
+            .eq("teacher_id", profile.id)
+            .eq("student_id", student_id)
+            .execute(),
+        )
 
+        # Verify student exists and belongs to the same school
         if not student_profile_result.get("data"):
-            print("[DEBUG]    ... Student not found in school. Raising 404.")
             raise HTTPException(status_code=404, detail="Student not found or not in your school.")
 
         student_profile = student_profile_result["data"][0]
-        print(f"[DEBUG]    ... Found student: {student_profile.get('full_name')}")
-
 
         if student_profile.get("role") != UserRole.STUDENT:
-            print(f"[DEBUG]    ... User {student_id} is not a student. Raising 400.")
             raise HTTPException(status_code=400, detail="Provided ID does not belong to a student.")
 
-        # Get classes that the student is part of AND that are taught by the current teacher
-        # This is a bit complex as we need to join across student_classes, classes, and subjects
-
-        # 1. Get all class_ids the student is enrolled in
-        print("[DEBUG] 2. Fetching student's class enrollments...")
-        student_classes_response = await supabase_client.query("student_classes").select("class_id") \
-            .eq("student_id", student_id) \
-            .execute()
-        student_class_ids = [cls["class_id"] for cls in student_classes_response["data"]]
-        print(f"[DEBUG]    ... Student is in class IDs: {student_class_ids}")
-
-
-        if not student_class_ids:
-            # Student is not in any classes, so definitely not in current teacher's classes.
-            # This is not a 404 for the student, but a 403 for the teacher trying to access.
-            print("[DEBUG]    ... Student is not in any classes. Raising 403.")
-            raise HTTPException(status_code=403, detail="Student is not assigned to any of your classes.")
-
-        # 2. Get details for these classes, filtering by the current teacher and joining with subjects
-        print(f"[DEBUG] 3. Checking which of these classes are taught by teacher {profile.id}...")
-        teacher_student_classes_result = await supabase_client.query("classes") \
-            .select("id, class_name, subjects(name)") \
-            .in_("id", student_class_ids) \
-            .eq("teacher_id", profile.id) \
-            .execute()
-
+        # Covers both "student is in no classes" and "student is not in any of this teacher's classes"
         teacher_student_classes_data = teacher_student_classes_result["data"]
-        print(f"[DEBUG]    ... Teacher's classes for this student: {teacher_student_classes_data}")
-
-
         if not teacher_student_classes_data:
-            print(f"[DEBUG]    ... Teacher does not teach any of the student's classes. Raising 403.")
             raise HTTPException(status_code=403, detail="Student is not assigned to any of your classes.")
 
         # Format classes for the response model
         formatted_classes: List[ClassDetail] = []
         for cls in teacher_student_classes_data:
             formatted_classes.append(ClassDetail(
-                id=cls["id"],
+                id=cls["class_id"],
                 class_name=cls["class_name"],
-                subject_name=cls["subjects"]["name"]  # Access nested subject name
+                subject_name=cls["subject_name"]
             ))
 
-        print("[DEBUG] 4. Successfully found student and classes. Returning data.")
         return StudentDetailResponse(
             id=student_profile["id"],
             full_name=student_profile["full_name"],
@@ -1000,8 +1052,7 @@ async def get_teacher_student_detail(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[ERROR] An unexpected error occurred: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Unexpected error fetching student %s for teacher %s", student_id, profile.id)
         raise HTTPException(status_code=500, detail=f"Error fetching student details: {str(e)}")
 
 
@@ -1013,8 +1064,7 @@ async def add_teacher_comment(
     """Teacher adds or updates a comment for a student in a specific class."""
     try:
         # Verify teacher teaches this class
-        class_check = await supabase_client.query("classes").select("id").eq("id", request.class_id).eq("teacher_id", profile.id).execute()
-        if not class_check.get("data"):
+        if not await supabase_client.exists("classes", id=request.class_id, teacher_id=profile.id):
             raise HTTPException(status_code=403, detail="You do not teach this class.")
 
         # Check for existing comment
@@ -1113,103 +1163,138 @@ async def delete_teacher_comment(
 # ADMIN ENDPOINTS
 # ============================================================================
 
-@app.get("/admin/students")
-async def get_all_students(
-        profile: Profile = Depends(require_admin)
-):
-    """Admin gets all students in school"""
-    start_time = time.time()
+async def student_details_version(student_id: str, school_id: str) -> str:
+    """Change token for a student's admin views (404 if the student is not in the school)"""
     try:
-        # 1. Get all students for the school
-        students_result = await supabase_client.query("profiles") \
-            .select("id, full_name, email, year_level") \
-            .eq("school_id", profile.school_id) \
-            .eq("role", UserRole.STUDENT) \
-            .execute()
-
-        students = students_result.get("data", [])
-        if not students:
-            return {"students": []}
-
-        student_ids = [s["id"] for s in students]
+        uuid.UUID(student_id)
+    except ValueError:
+        # Would fail the RPC's uuid cast; no such student either way
+        raise HTTPException(status_code=404, detail="Student not found")
 
-        # 2. Get all related data in batches
-        assessments_result = await supabase_client.query("assessment_results").select("user_id").in_("user_id", student_ids).execute()
-        student_classes_result = await supabase_client.query("student_classes").select("student_id, class_id").in_("student_id", student_ids).execute()
-        comments_result = await supabase_client.query("teacher_comments").select("student_id").in_("student_id", student_ids).execute()
+    result = await supabase_client.rpc(
+        "student_details_version", {"_student": student_id, "_school": school_id}
+    ).execute()
+    if result.get("error"):
+        raise Exception(result["error"])
+    if not result["data"]:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return result["data"][0]
 
-        # 3. Process into lookup maps
-        students_with_assessments = {a["user_id"] for a in assessments_result.get("data", [])}
-        students_with_teacher_comments = {c["student_id"] for c in comments_result.get("data", [])}
 
-        class_ids_by_student = {}
-        all_class_ids = set()
-        for sc in student_classes_result.get("data", []):
-            class_ids_by_student.setdefault(sc["student_id"], []).append(sc["class_id"])
-            all_class_ids.add(sc["class_id"])
+# Largest page GET /admin/students will serve
+MAX_STUDENT_PAGE_SIZE = 500
+# Row count above which response serialisation moves off the event loop
+LARGE_RESPONSE_ROWS = 500
 
-        class_name_by_id = {}
-        if all_class_ids:
-            classes_result = await supabase_client.query("classes").select("id, class_name").in_("id", list(all_class_ids)).execute()
-            class_name_by_id = {c["id"]: c.get("class_name", "") for c in classes_result.get("data", [])}
 
-        # 4. Enrich student data
-        enriched_students = []
-        for student in students:
-            student_class_ids = class_ids_by_student.get(student["id"], [])
-            student_class_names = [class_name_by_id.get(class_id, "") for class_id in student_class_ids]
-
-            enriched_students.append({
-                "id": student["id"],
-                "full_name": student["full_name"],
-                "email": student["email"],
-                "year_level": student.get("year_level", ""),
-                "class_ids": student_class_ids,
-                "class_names": student_class_names,
-                "has_assessment": student["id"] in students_with_assessments,
-                "has_teacher_comment": student["id"] in students_with_teacher_comments,
-            })
+@app.get("/admin/students")
+async def get_all_students(
+        request: Request,
+        page: Optional[int] = None,
+        size: int = 50,
+        fields: Optional[str] = None,
+        profile: Profile = Depends(require_admin)
+):
+    """
+    Admin gets all students in school.
+    page/size (1-based) return one page ordered by name; fields=summary returns only the total.
+    The total is always sent in the X-Total-Count header.
+    """
+    start_time = time.perf_counter()
+    try:
+        if page is not None and page < 1:
+            raise HTTPException(status_code=400, detail="page must be at least 1")
+        if not 1 <= size <= MAX_STUDENT_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"size must be between 1 and {MAX_STUDENT_PAGE_SIZE}")
+
+        if fields == "summary":
+            count_result = await supabase_client.query("profiles").select("id", count="exact", head=True) \
+                .eq("school_id", profile.school_id) \
+                .eq("role", UserRole.STUDENT) \
+                .execute()
+            if count_result.get("error"):
+                raise Exception(count_result["error"])
+            total = count_result.get("count") or 0
+            response = etag_response(request, {"total_students": total})
+            response.headers["X-Total-Count"] = str(total)
+            return response
+
+        # Students with class ids/names and assessment/comment flags, joined in Postgres
+        students_query = supabase_client.rpc("admin_students_overview", {"_school": profile.school_id})
+        if page is not None:
+            offset = (page - 1) * size
+            students_query = students_query.select("*", count="exact") \
+                .order("full_name", "id") \
+                .range(offset, offset + size - 1)
+        students_result = await students_query.execute()
+        if students_result.get("error"):
+            raise Exception(students_result["error"])
 
-        return {"students": enriched_students}
+        students = students_result["data"]
+        total = students_result.get("count")
+        if len(students) > LARGE_RESPONSE_ROWS:
+            response = await etag_response_in_thread(request, {"students": students})
+        else:
+            response = etag_response(request, {"students": students})
+        response.headers["X-Total-Count"] = str(total if total is not None else len(students))
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
     finally:
-        end_time = time.time()
-        print(f"PERF: get_all_students took {end_time - start_time:.4f} seconds.")
+        logger.info("perf.get_all_students=%.4fs", time.perf_counter() - start_time)
 
 
 @app.get("/admin/student/{student_id}")
 async def get_student_details(
         student_id: str,
+        request: Request,
         profile: Profile = Depends(require_admin)
 ):
     """Admin gets detailed student information"""
     try:
-        # Get student profile
-        student_result = await supabase_client.query("profiles").select("*").eq("id", student_id).eq("school_id", profile.school_id).execute()
+        version = await student_details_version(student_id, profile.school_id)
+        cached = not_modified(request, weak_etag(version))
+        if cached:
+            return cached
+
+        # Profile with assessment, classes -> subjects and comments -> commenting teacher embedded in one request
+        student_result = await supabase_client.query("profiles") \
+            .select(
+                "id, full_name, email, year_level, role, school_id, "
+                "assessment_results!user_id(user_id, ranking, profile_data, updated_at), "
+                "student_classes(class_id, classes(id, class_name, year_level, subject_id, subjects(id, name, category))), "
+                "teacher_comments!student_id("
+                "id, student_id, teacher_id, class_id, comment_text, performance_rating, engagement_rating, "
+                "created_at, updated_at, teacher:profiles!teacher_id(id, full_name))"
+            ) \
+            .eq("id", student_id) \
+            .eq("school_id", profile.school_id) \
+            .execute()
 
         if not student_result["data"]:
             raise HTTPException(status_code=404, detail="Student not found")
 
         student = student_result["data"][0]
+        assessment = student.pop("assessment_results", None)
+        if isinstance(assessment, list):
+            assessment = assessment[0] if assessment else None
+        student_classes = student.pop("student_classes", None) or []
+        comments = student.pop("teacher_comments", None) or []
 
-        # Get assessment
-        assessment_result = await supabase_client.query("assessment_results").select("*").eq("user_id", student_id).execute()
-
-        # Get classes
-        student_classes_result = await supabase_client.query("student_classes").select("class_id").eq("student_id", student_id).execute()
-        class_ids = [c["class_id"] for c in student_classes_result["data"]]
-
+        class_ids = [sc["class_id"] for sc in student_classes]
         classes = []
-        subjects = []
-        if class_ids:
-            classes_result = await supabase_client.query("classes").select("id, class_name, year_level, subject_id").in_("id", class_ids).execute()
-            classes = classes_result["data"]
-
-            subject_ids = list({c.get("subject_id") for c in classes if c.get("subject_id")})
-            if subject_ids:
-                subjects_result = await supabase_client.query("subjects").select("id, name, category").in_("id", subject_ids).execute()
-                subjects = subjects_result["data"]
+        subject_by_id = {}
+        for sc in student_classes:
+            cls = sc.get("classes")
+            if not cls:
+                continue
+            subject = cls.pop("subjects", None)
+            if subject:
+                subject_by_id[subject["id"]] = subject
+            classes.append(cls)
+        subjects = list(subject_by_id.values())
 
         class_name_by_id = {c["id"]: c.get("class_name", "") for c in classes}
         student["class_ids"] = class_ids
@@ -1217,27 +1302,18 @@ async def get_student_details(
         student["class_id"] = class_ids[0] if class_ids else None
         student["class_name"] = class_name_by_id.get(student["class_id"], "")
 
-        # Get comments
-        comments_result = await supabase_client.query("teacher_comments").select("*").eq("student_id", student_id).execute()
-        comments = comments_result["data"]
-
-        teacher_ids = list({c.get("teacher_id") for c in comments if c.get("teacher_id")})
-        teacher_name_by_id = {}
-        if teacher_ids:
-            teachers_result = await supabase_client.query("profiles").select("id, full_name").in_("id", teacher_ids).execute()
-            teacher_name_by_id = {t["id"]: t.get("full_name", "") for t in teachers_result["data"]}
-
         for c in comments:
-            c["teacher_name"] = teacher_name_by_id.get(c.get("teacher_id"))
+            teacher = c.pop("teacher", None) or {}
+            c["teacher_name"] = teacher.get("full_name")
             c["class_name"] = class_name_by_id.get(c.get("class_id"))
 
-        return {
+        return versioned_response({
             "profile": student,
-            "assessment": assessment_result["data"][0] if assessment_result["data"] else None,
+            "assessment": assessment,
             "classes": classes,
             "subjects": subjects,
             "comments": comments
-        }
+        }, version)
     except HTTPException:
         raise
     except Exception as e:
@@ -1247,20 +1323,20 @@ async def get_student_details(
 @app.get("/admin/student/{student_id}/career-aspirations")
 async def get_student_career_aspirations_admin(
     student_id: str,
+    request: Request,
     profile: Profile = Depends(require_admin)
 ):
     """Admin reads a student's career aspirations (with school_id check)."""
     try:
         # Verify student belongs to same school
-        student_check = await supabase_client.query("profiles").select("id").eq("id", student_id).eq("school_id", profile.school_id).execute()
-        if not student_check["data"]:
+        if not await student_ownership.load(profile.school_id, student_id):
             raise HTTPException(status_code=404, detail="Student not found")
 
         result = await supabase_client.query("student_career_aspirations") \
             .select("id, soc_code, title, created_at") \
             .eq("student_id", student_id) \
             .execute()
-        return {"aspirations": result.get("data", [])}
+        return etag_response(request, {"aspirations": result.get("data", [])})
     except HTTPException:
         raise
     except Exception as e:
@@ -1270,21 +1346,33 @@ async def get_student_career_aspirations_admin(
 @app.get("/admin/student/{student_id}/portfolio")
 async def get_student_portfolio_admin(
         student_id: str,
+        request: Request,
         profile: Profile = Depends(require_admin)
 ):
     """Admin gets a student's saved portfolio"""
     try:
+        version = await student_details_version(student_id, profile.school_id)
+        cached = not_modified(request, weak_etag(version))
+        if cached:
+            return cached
+
+        # Fetch the student (school check) and portfolio concurrently
+        student_result, portfolio_result = await asyncio.gather(
+            supabase_client.query("profiles").select("id,full_name,year_level,school_id").eq("id", student_id).eq("school_id", profile.school_id).execute(),
+            supabase_client.query("student_portfolios").select(PORTFOLIO_COLUMNS).eq("student_id", student_id).execute(),
+        )
+
         # Verify student belongs to same school
-        student_result = await supabase_client.query("profiles").select("id,full_name,year_level,school_id").eq("id", student_id).eq("school_id", profile.school_id).execute()
         if not student_result["data"]:
             raise HTTPException(status_code=404, detail="Student not found")
 
         student = student_result["data"][0]
-
-        portfolio_result = await supabase_client.query("student_portfolios").select("*").eq("student_id", student_id).execute()
         portfolio = portfolio_result["data"][0] if portfolio_result.get("data") else None
 
-        return {"portfolio": portfolio, "student_name": student.get("full_name", ""), "year_level": student.get("year_level", "")}
+        return versioned_response(
+            {"portfolio": portfolio, "student_name": student.get("full_name", ""), "year_level": student.get("year_level", "")},
+            version,
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -1294,6 +1382,7 @@ async def get_student_portfolio_admin(
 @app.get("/admin/student/{student_id}/notes")
 async def get_student_notes(
         student_id: str,
+        request: Request,
         profile: Profile = Depends(require_admin)
 ):
     """Admin gets all notes for a student"""
@@ -1303,7 +1392,7 @@ async def get_student_notes(
             .eq("student_id", student_id) \
             .eq("school_id", profile.school_id) \
             .execute()
-        return {"notes": notes_result.get("data", [])}
+        return etag_response(request, {"notes": notes_result.get("data", [])})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
@@ -1321,8 +1410,7 @@ async def add_student_note(
     """Admin adds a note on a student"""
     try:
         # Verify student belongs to same school
-        student_check = await supabase_client.query("profiles").select("id").eq("id", student_id).eq("school_id", profile.school_id).execute()
-        if not student_check["data"]:
+        if not await student_ownership.load(profile.school_id, student_id):
             raise HTTPException(status_code=404, detail="Student not found")
 
         note_data = {
@@ -1362,73 +1450,52 @@ async def update_student(
 ):
     """Admin updates student profile (name/year/class)"""
     try:
-        # Verify student exists and belongs to school
-        student_check = await supabase_client.query("profiles").select("*").eq("id", student_id).eq("school_id", profile.school_id).eq("role", UserRole.STUDENT).execute()
-
-        if not student_check["data"]:
-            raise HTTPException(status_code=404, detail="Student not found")
-
-        current_year_level = student_check["data"][0].get("year_level")
-        effective_year_level = request.year_level if request.year_level is not None else current_year_level
-
         update_data = {}
         if request.full_name is not None:
             update_data["full_name"] = request.full_name
         if request.year_level is not None:
             update_data["year_level"] = request.year_level
 
+        # Update (or just look up) the student, scoped to this school; no row back means not found
+        student_query = supabase_client.query("profiles")
         if update_data:
-            result = await supabase_client.query("profiles").update(update_data).eq("id", student_id).execute()
-            if result.get("error"):
-                raise Exception(result["error"])
-
-        # Update class assignments (multi-class)
-        if request.class_ids is not None:
-            class_ids = [class_id for class_id in request.class_ids if class_id]
-            unique_class_ids = list(dict.fromkeys(class_ids))
+            student_query = student_query.update(update_data)
+        student_result = await student_query.select("id, year_level") \
+            .eq("id", student_id) \
+            .eq("school_id", profile.school_id) \
+            .eq("role", UserRole.STUDENT) \
+            .execute()
+        if student_result.get("error"):
+            raise Exception(student_result["error"])
+        if not student_result["data"]:
+            raise HTTPException(status_code=404, detail="Student not found")
+        if update_data:
+            invalidate_user_profile(student_id)
 
-            if unique_class_ids:
-                classes_result = await supabase_client.query("classes").select("id, year_level").in_("id", unique_class_ids).eq(
-                    "school_id", profile.school_id
-                ).execute()
+        effective_year_level = student_result["data"][0].get("year_level")
 
-                classes = classes_result["data"]
-                if len(classes) != len(unique_class_ids):
+        # Update class assignments; class_ids (multi-class) wins over the backwards-compatible class_id.
+        # The RPC checks school and year level and replaces the rows in one transaction.
+        if request.class_ids is not None or request.class_id is not None:
+            if request.class_ids is not None:
+                class_ids = list(dict.fromkeys(class_id for class_id in request.class_ids if class_id))
+            else:
+                class_ids = [request.class_id] if request.class_id else []
+
+            replace_result = await supabase_client.rpc("replace_student_classes", {
+                "_student": student_id,
+                "_school": profile.school_id,
+                "_year_level": str(effective_year_level) if effective_year_level is not None else None,
+                "_classes": class_ids,
+            }).execute()
+
+            error = replace_result.get("error")
+            if error:
+                if "class_not_found" in error:
                     raise HTTPException(status_code=404, detail="One or more classes not found")
-
-                mismatched = [
-                    c for c in classes
-                    if not c.get("year_level") or c.get("year_level") != effective_year_level
-                ]
-                if mismatched:
-                    raise HTTPException(status_code=400,
-                                        detail="All classes must match the student's year level")
-
-            await supabase_client.query("student_classes").delete().eq("student_id", student_id).execute()
-
-            if unique_class_ids:
-                insert_rows = [{"student_id": student_id, "class_id": class_id} for class_id in unique_class_ids]
-                insert_result = await supabase_client.query("student_classes").insert(insert_rows).execute()
-                if insert_result.get("error"):
-                    raise Exception(insert_result["error"])
-
-        # Backwards-compatible single class assignment
-        elif request.class_id is not None:
-            class_id = request.class_id or None
-            if class_id:
-                class_check = await supabase_client.query("classes").select("id, year_level").eq("id", class_id).eq("school_id", profile.school_id).execute()
-                if not class_check["data"]:
-                    raise HTTPException(status_code=404, detail="Class not found")
-                class_year_level = class_check["data"][0].get("year_level")
-                if not class_year_level or class_year_level != effective_year_level:
-                    raise HTTPException(status_code=400, detail="Class year level must match the student's year level")
-
-            await supabase_client.query("student_classes").delete().eq("student_id", student_id).execute()
-
-            if class_id:
-                insert_result = await supabase_client.query("student_classes").insert({"student_id": student_id, "class_id": class_id}).execute()
-                if insert_result.get("error"):
-                    raise Exception(insert_result["error"])
+                if "class_mismatch" in error:
+                    raise HTTPException(status_code=400, detail="All classes must match the student's year level")
+                raise Exception(error)
 
         # Validate existing assignments when only year level changes
         elif request.year_level is not None:
@@ -1445,6 +1512,7 @@ async def update_student(
                     raise HTTPException(status_code=400,
                                         detail="Existing classes do not match the new year level")
 
+        invalidate_school_stats(profile.school_id)
         return {"message": "Student updated successfully"}
 
     except HTTPException:
@@ -1460,31 +1528,22 @@ async def delete_student(
 ):
     """Admin deletes student (cascades to related records)"""
     try:
-        # Verify student exists and belongs to school
-        student_check = await supabase_client.query("profiles").select("*").eq("id", student_id).eq("school_id", profile.school_id).eq("role", UserRole.STUDENT).execute()
-
-        if not student_check["data"]:
-            raise HTTPException(status_code=404, detail="Student not found")
-
-        # Delete profile (cascades due to foreign keys)
-        result = await supabase_client.query("profiles").delete().eq("id", student_id).execute()
+        # Delete profile (cascades due to foreign keys), scoped to this school; no row back means not found
+        result = await supabase_client.query("profiles").delete().select("id") \
+            .eq("id", student_id) \
+            .eq("school_id", profile.school_id) \
+            .eq("role", UserRole.STUDENT) \
+            .execute()
         if result.get("error"):
             raise Exception(result["error"])
+        if not result["data"]:
+            raise HTTPException(status_code=404, detail="Student not found")
+        invalidate_user_profile(student_id)
 
-        # Delete from auth
-
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SECRET_KEY")
-
-        async with httpx.AsyncClient() as client:
-            await client.delete(
-                f"{supabase_url}/auth/v1/admin/users/{student_id}",
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}",
-                }
-            )
+        # Only remove the auth user once the profile delete confirmed the student is in this school
+        await AUTH_HTTP.delete(f"/users/{student_id}")
 
+        invalidate_school_stats(profile.school_id)
         return {"message": "Student deleted successfully"}
 
     except HTTPException:
@@ -1493,36 +1552,56 @@ async def delete_student(
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+# School stats by school_id; entries are dropped by the endpoints that change the counts
+_school_stats_cache: TTLCache = TTLCache(maxsize=1_000, ttl=30)
+
+
+def invalidate_school_stats(school_id: str) -> None:
+    """Forget cached /admin/stats counts for a school"""
+    _school_stats_cache.pop(school_id, None)
+
+
 @app.get("/admin/stats")
 async def get_school_stats(
+        request: Request,
         profile: Profile = Depends(require_admin)
 ):
-    """Get school-wide statistics"""
+    """Get school-wide statistics (cached for up to 30 seconds)"""
     try:
         school_id = profile.school_id
 
-        # Count students
-        students_result = await supabase_client.query("profiles").select("id").eq("school_id", school_id).eq("role", UserRole.STUDENT).execute()
-        total_students = len(students_result.get("data", []))
-
-        # Count teachers
-        teachers_result = await supabase_client.query("profiles").select("id").eq("school_id", school_id).eq("role", UserRole.TEACHER).execute()
-        total_teachers = len(teachers_result.get("data", []))
-
-        # Count classes
-        classes_result = await supabase_client.query("classes").select("id").eq("school_id", school_id).execute()
-        total_classes = len(classes_result.get("data", []))
+        cached = _school_stats_cache.get(school_id)
+        if cached is not None:
+            return etag_response(request, cached)
+
+        # Count students, teachers, classes and completed assessments with
+        # concurrent HEAD requests (the total comes back in Content-Range, no rows)
+        students_result, teachers_result, classes_result, assessments_result = await asyncio.gather(
+            supabase_client.query("profiles").select("id", count="exact", head=True)
+            .eq("school_id", school_id).eq("role", UserRole.STUDENT).execute(),
+            supabase_client.query("profiles").select("id", count="exact", head=True)
+            .eq("school_id", school_id).eq("role", UserRole.TEACHER).execute(),
+            supabase_client.query("classes").select("id", count="exact", head=True)
+            .eq("school_id", school_id).execute(),
+            supabase_client.query("assessment_results").select("user_id", count="exact", head=True)
+            .eq("school_id", school_id).execute(),
+        )
 
-        # Count assessments completed
-        assessments_result = await supabase_client.query("assessment_results").select("user_id").eq("school_id", school_id).execute()
-        total_assessments = len(assessments_result.get("data", []))
+        total_students = students_result.get("count") or 0
+        total_teachers = teachers_result.get("count") or 0
+        total_classes = classes_result.get("count") or 0
+        total_assessments = assessments_result.get("count") or 0
 
-        return {
+        stats = {
             "total_students": total_students,
             "total_teachers": total_teachers,
             "total_classes": total_classes,
             "completed_assessments": total_assessments
         }
+        if not any(r.get("error") for r in (students_result, teachers_result, classes_result, assessments_result)):
+            _school_stats_cache[school_id] = stats
+
+        return etag_response(request, stats)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load stats: {str(e)}")
@@ -1535,34 +1614,22 @@ async def add_student(
 ):
     """Admin adds a new student to the school"""
     try:
-        # Create auth user in Supabase
-
-
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SECRET_KEY")
-
-        # Create user via Supabase Admin API
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{supabase_url}/auth/v1/admin/users",
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "email": request.email,
-                    "password": request.password,
-                    "email_confirm": True
-                }
-            )
+        # Create auth user via Supabase Admin API
+        response = await AUTH_HTTP.post(
+            "/users",
+            json={
+                "email": request.email,
+                "password": request.password,
+                "email_confirm": True
+            }
+        )
 
-            if response.status_code != 200:
-                error_detail = response.json()
-                raise HTTPException(status_code=400, detail=f"Failed to create user: {error_detail}")
+        if response.status_code != 200:
+            error_detail = response.json()
+            raise HTTPException(status_code=400, detail=f"Failed to create user: {error_detail}")
 
-            user_data = response.json()
-            user_id = user_data["id"]
+        user_data = response.json()
+        user_id = user_data["id"]
 
         # Create profile
         profile_data = {
@@ -1579,6 +1646,7 @@ async def add_student(
         if result.get("error"):
             raise Exception(result["error"])
 
+        invalidate_school_stats(profile.school_id)
         return {
             "id": user_id,
             "message": "Student added successfully"
@@ -1599,68 +1667,37 @@ async def get_all_teachers(
         profile: Profile = Depends(require_admin)
 ):
     """Admin gets all teachers with their classes and subjects"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
-        # 1. Get all teachers for the school
+        # Teachers with the classes they teach (and each class's subject) embedded in one request
         teachers_result = await supabase_client.query("profiles") \
-            .select("id, full_name, email") \
+            .select("id, full_name, email, classes!teacher_id(*, subjects(id, name, category))") \
             .eq("school_id", profile.school_id) \
             .eq("role", UserRole.TEACHER) \
             .execute()
 
-        teachers = teachers_result.get("data", [])
-        if not teachers:
-            return {"teachers": []}
-
-        teacher_map = {t["id"]: t for t in teachers}
-
-        # 2. Get all classes for the school, with subjects embedded
-        classes_result = await supabase_client.query("classes") \
-            .select("*, subjects(id, name, category)") \
-            .eq("school_id", profile.school_id) \
-            .execute()
-
-        classes = classes_result.get("data", [])
-
-        # 3. Process classes and subjects in Python
-        classes_by_teacher = {}
-        subjects_by_teacher = {}
-        for cls in classes:
-            teacher_id = cls.get("teacher_id")
-            if not teacher_id:
-                continue
-
-            # Group classes by teacher
-            classes_by_teacher.setdefault(teacher_id, []).append(cls)
-
-            # Group subjects by teacher
-            subject = cls.get("subjects")
-            if subject:
-                subjects_by_teacher.setdefault(teacher_id, {})[subject["id"]] = subject
-
-        # 4. Enrich the teacher data
         enriched_teachers = []
-        for teacher_id, teacher in teacher_map.items():
-            classes_taught = classes_by_teacher.get(teacher_id, [])
-            subjects_taught_map = subjects_by_teacher.get(teacher_id, {})
+        for teacher in teachers_result.get("data", []):
+            classes_taught = teacher.get("classes") or []
+            subjects_taught = list({c["subjects"]["id"]: c["subjects"] for c in classes_taught if c.get("subjects")}.values())
 
             enriched_teachers.append({
                 "id": teacher["id"],
                 "full_name": teacher["full_name"],
                 "email": teacher["email"],
                 "classes_taught": classes_taught,
-                "subjects_taught": list(subjects_taught_map.values()),
+                "subjects_taught": subjects_taught,
                 "classes_count": len(classes_taught),
-                "subjects_count": len(subjects_taught_map)
+                "subjects_count": len(subjects_taught)
             })
 
-        return {"teachers": enriched_teachers}
+        # Rows are plain JSON from PostgREST; skip FastAPI's jsonable_encoder pass
+        return ORJSONResponse({"teachers": enriched_teachers})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
     finally:
-        end_time = time.time()
-        print(f"PERF: get_all_teachers took {end_time - start_time:.4f} seconds.")
+        logger.info("perf.get_all_teachers=%.4fs", time.perf_counter() - start_time)
 
 
 @app.get("/admin/teacher/{teacher_id}")
@@ -1670,49 +1707,51 @@ async def get_teacher_details(
 ):
     """Admin gets detailed teacher information"""
     try:
-        # Get teacher profile
-        teacher_result = await supabase_client.query("profiles").select("*").eq("id", teacher_id).eq("school_id", profile.school_id).eq("role",
-                                                                                                            UserRole.TEACHER).execute()
+        # Get teacher profile and classes taught concurrently
+        teacher_result, classes_result = await asyncio.gather(
+            supabase_client.query("profiles").select("id, full_name, email, role, school_id").eq("id", teacher_id).eq("school_id", profile.school_id)
+            .eq("role", UserRole.TEACHER).execute(),
+            supabase_client.query("classes").select("*").eq("teacher_id", teacher_id).execute(),
+        )
 
         if not teacher_result["data"]:
             raise HTTPException(status_code=404, detail="Teacher not found")
 
         teacher = teacher_result["data"][0]
-
-        # Get classes taught
-        classes_result = await supabase_client.query("classes").select("*").eq("teacher_id", teacher_id).execute()
-
         classes = classes_result["data"]
 
-        # Get subjects from classes
-        subject_ids = list({c["subject_id"] for c in classes})
+        # Get subjects and enrolments for those classes concurrently
+        subject_ids = dict.fromkeys(c["subject_id"] for c in classes if c.get("subject_id"))
+        class_ids = [c["id"] for c in classes]
 
-        subjects = []
-        if subject_ids:
-            subjects_result = await supabase_client.query("subjects").select("*").in_("id", subject_ids).execute()
-            subjects = subjects_result["data"]
+        subjects_result, student_classes_result = await asyncio.gather(
+            supabase_client.query("subjects").select("*").in_("id", subject_ids).execute()
+            if subject_ids else _no_rows(),
+            supabase_client.query("student_classes").select("student_id, class_id").in_("class_id", class_ids).execute()
+            if class_ids else _no_rows(),
+        )
+        subjects = subjects_result["data"]
 
         # Get students in teacher's classes
-        class_ids = [c["id"] for c in classes]
-
         students = []
         if class_ids:
-            student_classes_result = await supabase_client.query("student_classes").select("student_id, class_id").in_("class_id", class_ids).execute()
-
-            student_ids = list({sc["student_id"] for sc in student_classes_result["data"]})
+            student_ids = dict.fromkeys(sc["student_id"] for sc in student_classes_result["data"])
 
             if student_ids:
                 students_result = await supabase_client.query("profiles").select("id, full_name, email, year_level").in_("id",
                                                                                              student_ids).execute()
+                # One pass over enrolments collects each student's class ids and names together
                 class_name_by_id = {c["id"]: c.get("class_name", "") for c in classes}
-                class_ids_by_student = {}
+                class_ids_by_student = defaultdict(list)
+                class_names_by_student = defaultdict(list)
                 for sc in student_classes_result["data"]:
-                    class_ids_by_student.setdefault(sc["student_id"], []).append(sc["class_id"])
+                    class_ids_by_student[sc["student_id"]].append(sc["class_id"])
+                    class_names_by_student[sc["student_id"]].append(class_name_by_id.get(sc["class_id"], ""))
 
                 students = []
                 for student in students_result["data"]:
                     student_class_ids = class_ids_by_student.get(student["id"], [])
-                    student_class_names = [class_name_by_id.get(class_id, "") for class_id in student_class_ids]
+                    student_class_names = class_names_by_student.get(student["id"], [])
                     enriched = {
                         **student,
                         "class_ids": student_class_ids,
@@ -1742,34 +1781,22 @@ async def add_teacher(
 ):
     """Admin adds a new teacher to the school"""
     try:
-        # Create auth user in Supabase
-
-
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SECRET_KEY")
-
-        # Create user via Supabase Admin API
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{supabase_url}/auth/v1/admin/users",
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "email": request.email,
-                    "password": request.password,
-                    "email_confirm": True
-                }
-            )
+        # Create auth user via Supabase Admin API
+        response = await AUTH_HTTP.post(
+            "/users",
+            json={
+                "email": request.email,
+                "password": request.password,
+                "email_confirm": True
+            }
+        )
 
-            if response.status_code != 200:
-                error_detail = response.json()
-                raise HTTPException(status_code=400, detail=f"Failed to create user: {error_detail}")
+        if response.status_code != 200:
+            error_detail = response.json()
+            raise HTTPException(status_code=400, detail=f"Failed to create user: {error_detail}")
 
-            user_data = response.json()
-            user_id = user_data["id"]
+        user_data = response.json()
+        user_id = user_data["id"]
 
         # Create profile
         profile_data = {
@@ -1785,6 +1812,7 @@ async def add_teacher(
         if result.get("error"):
             raise Exception(result["error"])
 
+        invalidate_school_stats(profile.school_id)
         return {
             "id": user_id,
             "message": "Teacher added successfully"
@@ -1805,10 +1833,7 @@ async def update_teacher(
     """Admin updates teacher profile"""
     try:
         # Verify teacher exists and belongs to school
-        teacher_check = await supabase_client.query("profiles").select("*").eq("id", teacher_id).eq("school_id", profile.school_id).eq("role",
-                                                                                                           UserRole.TEACHER).execute()
-
-        if not teacher_check["data"]:
+        if not await supabase_client.exists("profiles", id=teacher_id, school_id=profile.school_id, role=UserRole.TEACHER):
             raise HTTPException(status_code=404, detail="Teacher not found")
 
         # Build update data
@@ -1826,6 +1851,7 @@ async def update_teacher(
 
         if result.get("error"):
             raise Exception(result["error"])
+        invalidate_user_profile(teacher_id)
 
         return {"message": "Teacher updated successfully", "teacher": result["data"][0]}
 
@@ -1843,32 +1869,27 @@ async def delete_teacher(
     """Admin deletes teacher (cascades to classes)"""
     try:
         # Verify teacher exists and belongs to school
-        teacher_check = await supabase_client.query("profiles").select("*").eq("id", teacher_id).eq("school_id", profile.school_id).eq("role",
-                                                                                                           UserRole.TEACHER).execute()
-
-        if not teacher_check["data"]:
+        if not await supabase_client.exists("profiles", id=teacher_id, school_id=profile.school_id, role=UserRole.TEACHER):
             raise HTTPException(status_code=404, detail="Teacher not found")
 
-        # Delete profile (cascades due to foreign keys)
-        result = await supabase_client.query("profiles").delete().eq("id", teacher_id).execute()
+        # Delete profile (cascades due to foreign keys) and the auth user concurrently
+        result, auth_response = await asyncio.gather(
+            supabase_client.query("profiles").delete().eq("id", teacher_id).execute(),
+            AUTH_HTTP.delete(f"/users/{teacher_id}"),
+            return_exceptions=True,
+        )
+        invalidate_user_profile(teacher_id)
 
+        if isinstance(result, BaseException):
+            raise result
         if result.get("error"):
             raise Exception(result["error"])
+        if isinstance(auth_response, BaseException):
+            raise auth_response
+        if auth_response.is_error and auth_response.status_code != 404:
+            raise Exception(f"Failed to delete auth user: {auth_response.text}")
 
-        # Delete from auth
-
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SECRET_KEY")
-
-        async with httpx.AsyncClient() as client:
-            await client.delete(
-                f"{supabase_url}/auth/v1/admin/users/{teacher_id}",
-                headers={
-                    "apikey": supabase_key,
-                    "Authorization": f"Bearer {supabase_key}",
-                }
-            )
-
+        invalidate_school_stats(profile.school_id)
         return {"message": "Teacher deleted successfully"}
 
     except HTTPException:
@@ -1887,26 +1908,27 @@ async def get_all_subjects(
 ):
     """Admin gets all subjects in the school"""
     try:
-        subjects_by_name = await ensure_hardcoded_subjects(profile.school_id)
-        enriched_subjects = []
+        subjects_by_name, counts_result = await asyncio.gather(
+            ensure_hardcoded_subjects(profile.school_id),
+            supabase_client.rpc("subject_class_counts", {"_school": profile.school_id}).execute(),
+        )
+        if counts_result.get("error"):
+            raise Exception(counts_result["error"])
+        classes_count_by_subject = {r["subject_id"]: r["class_count"] for r in counts_result["data"]}
 
+        enriched_subjects = []
         for subject in HARD_CODED_SUBJECTS:
             key = subject["name"].strip().lower()
             existing = subjects_by_name.get(key)
             if not existing:
                 continue
 
-            # Count classes for this subject
-            classes_result = await supabase_client.query("classes").select("id").eq("subject_id", existing["id"]).execute()
-
-            classes_count = len(classes_result["data"])
-
             enriched_subjects.append({
                 "id": existing["id"],
                 "name": existing.get("name", subject["name"]),
                 "category": existing.get("category", subject["category"]),
                 "year_level": existing.get("year_level", ""),
-                "classes_count": classes_count
+                "classes_count": classes_count_by_subject.get(existing["id"], 0)
             })
 
         return {"subjects": enriched_subjects}
@@ -1919,84 +1941,59 @@ async def get_all_subjects(
 # ADMIN CLASS ENDPOINTS
 # ============================================================================
 
+# Fields GET /admin/classes returns for each class
+ADMIN_CLASS_SUMMARY_COLUMNS = (
+    "id, class_name, year_level, subject_name, subject_category, teacher_name, teacher_id, subject_id, student_count"
+)
+
+
 @app.get("/admin/classes")
 async def get_all_classes(
         profile: Profile = Depends(require_admin)
 ):
     """Admin gets all classes in the school"""
-    start_time = time.time()
+    start_time = time.perf_counter()
     try:
-        # Get all classes (simple select, no embedding)
-        classes_result = await supabase_client.query("classes") \
-            .select("*") \
+        # Classes with subject/teacher names and enrolment counts, precomputed in admin_class_summary
+        classes_result = await supabase_client.query("admin_class_summary") \
+            .select(ADMIN_CLASS_SUMMARY_COLUMNS) \
             .eq("school_id", profile.school_id) \
             .execute()
 
         if classes_result.get("error"):
             raise HTTPException(status_code=500, detail=f"DB error: {classes_result['error']}")
 
-        classes = classes_result.get("data", [])
+        return ORJSONResponse({"classes": classes_result.get("data", [])})
 
-        if not classes:
-            return {"classes": []}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    finally:
+        logger.info("perf.get_all_classes=%.4fs", time.perf_counter() - start_time)
 
-        class_ids = [c["id"] for c in classes]
-        subject_ids = list(set(c["subject_id"] for c in classes if c.get("subject_id")))
-        teacher_ids = list(set(c["teacher_id"] for c in classes if c.get("teacher_id")))
-
-        # Fetch subjects, teachers, and student counts separately
-        subjects_map = {}
-        if subject_ids:
-            subjects_result = await supabase_client.query("subjects") \
-                .select("id, name, category") \
-                .in_("id", subject_ids) \
-                .execute()
-            for s in subjects_result.get("data", []):
-                subjects_map[s["id"]] = s
-
-        teachers_map = {}
-        if teacher_ids:
-            teachers_result = await supabase_client.query("profiles") \
-                .select("id, full_name") \
-                .in_("id", teacher_ids) \
-                .execute()
-            for t in teachers_result.get("data", []):
-                teachers_map[t["id"]] = t
 
-        student_classes_result = await supabase_client.query("student_classes") \
-            .select("class_id") \
-            .in_("class_id", class_ids) \
-            .execute()
+async def assign_class_roster(class_id: str, school_id: str, year_level, student_ids: List[str]) -> None:
+    """
+    Set a class's roster via the assign_class_roster RPC, which checks school and year level in SQL.
+    Raises 404 for unknown students and 400 for year-level mismatches.
+    """
+    result = await supabase_client.rpc("assign_class_roster", {
+        "_class": class_id,
+        "_school": school_id,
+        "_year_level": str(year_level) if year_level is not None else None,
+        "_students": student_ids,
+    }).execute()
 
-        student_counts = {}
-        for sc in student_classes_result.get("data", []):
-            class_id = sc["class_id"]
-            student_counts[class_id] = student_counts.get(class_id, 0) + 1
-
-        enriched_classes = []
-        for cls in classes:
-            subject = subjects_map.get(cls.get("subject_id"), {})
-            teacher = teachers_map.get(cls.get("teacher_id"), {})
-
-            enriched_classes.append({
-                "id": cls["id"],
-                "class_name": cls["class_name"],
-                "year_level": cls.get("year_level"),
-                "subject_name": subject.get("name", ""),
-                "subject_category": subject.get("category", ""),
-                "teacher_name": teacher.get("full_name", ""),
-                "teacher_id": cls.get("teacher_id"),
-                "subject_id": cls.get("subject_id"),
-                "student_count": student_counts.get(cls["id"], 0)
-            })
+    if result.get("error"):
+        raise_roster_error(result["error"])
 
-        return {"classes": enriched_classes}
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
-    finally:
-        end_time = time.time()
-        print(f"PERF: get_all_classes took {end_time - start_time:.4f} seconds.")
+def raise_roster_error(error: str):
+    """Map an assign_class_roster error to the matching HTTP error"""
+    if "student_not_found" in error:
+        raise HTTPException(status_code=404, detail="One or more students not found")
+    if "student_mismatch" in error:
+        raise HTTPException(status_code=400, detail="All students must be in the same year level as the class")
+    raise Exception(error)
 
 
 @app.post("/admin/class")
@@ -2011,7 +2008,6 @@ async def create_class(
         if not subject_id and subject_name:
             subjects_by_name = await ensure_hardcoded_subjects(profile.school_id)
             subject = subjects_by_name.get(subject_name.lower())
-            print(subject)
             if not subject:
                 raise HTTPException(status_code=404, detail="Subject not found")
             subject_id = subject["id"]
@@ -2019,21 +2015,23 @@ async def create_class(
         if not subject_id:
             raise HTTPException(status_code=400, detail="Subject is required")
 
-        # Verify subject exists and belongs to school
-        subject_check = await supabase_client.query("subjects").select("*").eq("id", subject_id).eq("school_id",
-                                                                                profile.school_id).execute()
+        unique_student_ids = []
+        if request.student_ids is not None:
+            unique_student_ids = list(dict.fromkeys(student_id for student_id in request.student_ids if student_id))
 
-        if not subject_check["data"]:
-            raise HTTPException(status_code=404, detail="Subject not found")
+        # Verify subject and teacher belong to the school concurrently
+        subject_exists, teacher_exists = await asyncio.gather(
+            supabase_client.exists("subjects", id=subject_id, school_id=profile.school_id),
+            supabase_client.exists("profiles", id=request.teacher_id, school_id=profile.school_id, role=UserRole.TEACHER),
+        )
 
-        # Verify teacher exists and belongs to school
-        teacher_check = await supabase_client.query("profiles").select("*").eq("id", request.teacher_id).eq("school_id", profile.school_id).eq(
-            "role", UserRole.TEACHER).execute()
+        if not subject_exists:
+            raise HTTPException(status_code=404, detail="Subject not found")
 
-        if not teacher_check["data"]:
+        if not teacher_exists:
             raise HTTPException(status_code=404, detail="Teacher not found")
 
-        # Create class
+        # Create class and assign students (optional) in one transaction
         class_data = {
             "school_id": profile.school_id,
             "subject_id": subject_id,
@@ -2042,39 +2040,17 @@ async def create_class(
             "class_name": request.class_name
         }
 
-        result = await supabase_client.query("classes").insert(class_data).execute()
+        result = await supabase_client.rpc("create_class_with_roster", {
+            "_class": class_data,
+            "_students": unique_student_ids,
+        }).execute()
 
         if result.get("error"):
-            raise Exception(result["error"])
+            raise_roster_error(result["error"])
 
         class_id = result["data"][0]["id"]
 
-        # Assign students (optional)
-        if request.student_ids is not None:
-            student_ids = [student_id for student_id in request.student_ids if student_id]
-            unique_student_ids = list(dict.fromkeys(student_ids))
-
-            if unique_student_ids:
-                students_result = await supabase_client.query("profiles").select("id, year_level").in_("id", unique_student_ids).eq(
-                    "school_id", profile.school_id
-                ).eq("role", UserRole.STUDENT).execute()
-
-                students = students_result["data"]
-                if len(students) != len(unique_student_ids):
-                    raise HTTPException(status_code=404, detail="One or more students not found")
-
-                mismatched = [
-                    s for s in students
-                    if not s.get("year_level") or s.get("year_level") != request.year_level
-                ]
-                if mismatched:
-                    raise HTTPException(status_code=400, detail="All students must be in the same year level as the class")
-
-                insert_rows = [{"student_id": student_id, "class_id": class_id} for student_id in unique_student_ids]
-                insert_result = await supabase_client.query("student_classes").insert(insert_rows).execute()
-                if insert_result.get("error"):
-                    raise Exception(insert_result["error"])
-
+        invalidate_school_stats(profile.school_id)
         return {
             "id": class_id,
             "message": "Class created successfully",
@@ -2099,7 +2075,7 @@ async def update_class(
 ):
     """Admin updates class details and roster"""
     try:
-        class_result = await supabase_client.query("classes").select("*").eq("id", class_id).eq("school_id", profile.school_id).execute()
+        class_result = await supabase_client.query("classes").select("id, year_level").eq("id", class_id).eq("school_id", profile.school_id).execute()
 
         if not class_result["data"]:
             raise HTTPException(status_code=404, detail="Class not found")
@@ -2117,16 +2093,12 @@ async def update_class(
                     raise HTTPException(status_code=404, detail="Subject not found")
                 resolved_subject_id = subject["id"]
             if resolved_subject_id:
-                subject_check = await supabase_client.query("subjects").select("id").eq("id", resolved_subject_id).eq("school_id",
-                                                                                        profile.school_id).execute()
-                if not subject_check["data"]:
+                if not await supabase_client.exists("subjects", id=resolved_subject_id, school_id=profile.school_id):
                     raise HTTPException(status_code=404, detail="Subject not found")
 
         if request.teacher_id is not None:
-            teacher_check = await supabase_client.query("profiles").select("id").eq("id", request.teacher_id).eq("school_id",
-                                                                                      profile.school_id).eq(
-                "role", UserRole.TEACHER).execute()
-            if not teacher_check["data"]:
+            if not await supabase_client.exists("profiles", id=request.teacher_id, school_id=profile.school_id,
+                                                role=UserRole.TEACHER):
                 raise HTTPException(status_code=404, detail="Teacher not found")
 
         effective_year_level = request.year_level if request.year_level is not None else existing_class.get(
@@ -2166,42 +2138,7 @@ async def update_class(
             student_ids = [student_id for student_id in request.student_ids if student_id]
             unique_student_ids = list(dict.fromkeys(student_ids))
 
-            if unique_student_ids:
-                students_result = await supabase_client.query("profiles").select("id, year_level").in_("id", unique_student_ids).eq(
-                    "school_id", profile.school_id
-                ).eq("role", UserRole.STUDENT).execute()
-
-                students = students_result["data"]
-                if len(students) != len(unique_student_ids):
-                    raise HTTPException(status_code=404, detail="One or more students not found")
-
-                mismatched = [
-                    s for s in students
-                    if not s.get("year_level") or s.get("year_level") != effective_year_level
-                ]
-                if mismatched:
-                    raise HTTPException(status_code=400,
-                                        detail="All students must be in the same year level as the class")
-
-            current_result = await supabase_client.query("student_classes").select("student_id").eq("class_id", class_id).execute()
-            current_ids = [row["student_id"] for row in current_result["data"]]
-
-            current_set = set(current_ids)
-            requested_set = set(unique_student_ids)
-
-            to_add = [student_id for student_id in unique_student_ids if student_id not in current_set]
-            to_remove = [student_id for student_id in current_ids if student_id not in requested_set]
-
-            if to_remove:
-                delete_result = await supabase_client.query("student_classes").delete().eq("class_id", class_id).in_("student_id", to_remove).execute()
-                if delete_result.get("error"):
-                    raise Exception(delete_result["error"])
-
-            if to_add:
-                insert_rows = [{"student_id": student_id, "class_id": class_id} for student_id in to_add]
-                insert_result = await supabase_client.query("student_classes").insert(insert_rows).execute()
-                if insert_result.get("error"):
-                    raise Exception(insert_result["error"])
+            await assign_class_roster(class_id, profile.school_id, effective_year_level, unique_student_ids)
 
         return {"message": "Class updated successfully"}
 
@@ -2218,9 +2155,7 @@ async def delete_class(
 ):
     """Admin deletes a class and clears roster"""
     try:
-        class_result = await supabase_client.query("classes").select("id").eq("id", class_id).eq("school_id", profile.school_id).execute()
-
-        if not class_result["data"]:
+        if not await supabase_client.exists("classes", id=class_id, school_id=profile.school_id):
             raise HTTPException(status_code=404, detail="Class not found")
 
         roster_delete = await supabase_client.query("student_classes").delete().eq("class_id", class_id).execute()
@@ -2231,6 +2166,7 @@ async def delete_class(
         if class_delete.get("error"):
             raise Exception(class_delete["error"])
 
+        invalidate_school_stats(profile.school_id)
         return {"message": "Class deleted successfully"}
 
     except HTTPException:
@@ -2251,35 +2187,32 @@ async def get_reports_summary(
     try:
         school_id = profile.school_id
 
-        # Get all classes in school
-        classes_result = await supabase_client.query("classes").select("*").eq("school_id", school_id).execute()
-
-        classes = classes_result["data"]
-
-        # Get all students with assessments
-        assessments_result = await supabase_client.query("assessment_results").select("user_id, ranking").eq("school_id", school_id).execute()
-
-        assessments_by_user = {a["user_id"]: a["ranking"] for a in assessments_result["data"]}
-
-        # Get all students
-        students_result = await supabase_client.query("profiles").select("id, full_name, email, year_level").eq("school_id", school_id).eq("role",
-                                                                                                               UserRole.STUDENT).execute()
+        # Classes (with subject/teacher names and enrolment counts), assessment rankings and students, concurrently
+        classes_result, assessments_result, students_result = await asyncio.gather(
+            supabase_client.query("admin_class_summary")
+            .select("id, class_name, year_level, subject_name, subject_category, teacher_name, student_count")
+            .eq("school_id", school_id)
+            .execute(),
+            supabase_client.rpc("school_top_careers", {"_school": school_id}).execute(),
+            supabase_client.query("profiles").select("id, full_name, email, year_level").eq("school_id", school_id)
+            .eq("role", UserRole.STUDENT).execute(),
+        )
 
+        top_career_by_user = {a["user_id"]: a for a in assessments_result["data"]}
         students = students_result["data"]
 
         # Enrich students with top career
         enriched_students = []
         for student in students:
             student_id = student["id"]
-            ranking = assessments_by_user.get(student_id)
+            assessment = top_career_by_user.get(student_id)
 
             top_career = None
-            if ranking:
-                # ranking is [[soc_code, career_name, score], ...]
+            if assessment and assessment["soc_code"] is not None:
                 top_career = {
-                    "soc_code": ranking[0][0],
-                    "career_name": ranking[0][1],
-                    "score": ranking[0][2]
+                    "soc_code": assessment["soc_code"],
+                    "career_name": assessment["career_name"],
+                    "score": assessment["score"]
                 }
 
             enriched_students.append({
@@ -2288,43 +2221,13 @@ async def get_reports_summary(
                 "email": student["email"],
                 "year_level": student.get("year_level", ""),
                 "top_career": top_career,
-                "has_assessment": ranking is not None
+                "has_assessment": assessment is not None
             })
 
-        # Enrich classes with student count
-        enriched_classes = []
-        for cls in classes:
-            class_id = cls["id"]
-
-            # Count students in class
-            student_classes_result = await supabase_client.query("student_classes").select("student_id").eq("class_id", class_id).execute()
-
-            student_count = len(student_classes_result["data"])
-
-            # Get subject name
-            subject_result = await supabase_client.query("subjects").select("name, category").eq("id", cls["subject_id"]).execute()
-
-            subject = subject_result["data"][0] if subject_result["data"] else {}
-
-            # Get teacher name
-            teacher_result = await supabase_client.query("profiles").select("full_name").eq("id", cls["teacher_id"]).execute()
-
-            teacher = teacher_result["data"][0] if teacher_result["data"] else {}
-
-            enriched_classes.append({
-                "id": class_id,
-                "class_name": cls["class_name"],
-                "year_level": cls["year_level"],
-                "subject_name": subject.get("name", ""),
-                "subject_category": subject.get("category", ""),
-                "teacher_name": teacher.get("full_name", ""),
-                "student_count": student_count
-            })
-
-        return {
-            "classes": enriched_classes,
+        return ORJSONResponse({
+            "classes": classes_result["data"],
             "students": enriched_students
-        }
+        })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -2335,72 +2238,16 @@ async def get_reports_summary(
 # ============================================================================
 
 
+@coalesce
 async def _get_teacher_status(student_id: str) -> dict:
     """
     Check how many of a student's teachers have submitted comments.
     Returns { total_teachers, commented_teachers, all_commented, missing }.
     """
-    # Get student's class_ids
-    sc_result = await supabase_client.query("student_classes") \
-        .select("class_id") \
-        .eq("student_id", student_id) \
-        .execute()
-    class_ids = [r["class_id"] for r in sc_result.get("data", [])]
-
-    if not class_ids:
-        return {
-            "total_teachers": 0,
-            "commented_teachers": 0,
-            "all_commented": True,
-            "missing": [],
-        }
-
-    # Get distinct teacher_ids from those classes
-    classes_result = await supabase_client.query("classes") \
-        .select("teacher_id") \
-        .in_("id", class_ids) \
-        .execute()
-    all_teacher_ids = list(set(
-        c["teacher_id"] for c in classes_result.get("data", []) if c.get("teacher_id")
-    ))
-
-    if not all_teacher_ids:
-        return {
-            "total_teachers": 0,
-            "commented_teachers": 0,
-            "all_commented": True,
-            "missing": [],
-        }
-
-    # Get teacher_ids that have commented on this student
-    comments_result = await supabase_client.query("teacher_comments") \
-        .select("teacher_id") \
-        .eq("student_id", student_id) \
-        .execute()
-    commented_teacher_ids = set(
-        c["teacher_id"] for c in comments_result.get("data", []) if c.get("teacher_id")
-    )
-
-    missing_ids = [tid for tid in all_teacher_ids if tid not in commented_teacher_ids]
-
-    # Get names for missing teachers
-    missing_names = []
-    if missing_ids:
-        names_result = await supabase_client.query("profiles") \
-            .select("id, full_name") \
-            .in_("id", missing_ids) \
-            .execute()
-        missing_names = [
-            {"id": t["id"], "name": t.get("full_name", "Unknown")}
-            for t in names_result.get("data", [])
-        ]
-
-    return {
-        "total_teachers": len(all_teacher_ids),
-        "commented_teachers": len(commented_teacher_ids & set(all_teacher_ids)),
-        "all_commented": set(all_teacher_ids).issubset(commented_teacher_ids),
-        "missing": missing_names,
-    }
+    result = await supabase_client.rpc("teacher_comment_status", {"_student": student_id}).execute()
+    if result.get("error"):
+        raise Exception(result["error"])
+    return result["data"][0]
 
 
 @app.get("/student/teacher-status")
@@ -2417,83 +2264,16 @@ async def get_teacher_comment_status(
 
 # ── Shared helpers for analysis endpoints ──────────────────────────
 
-async def _load_teacher_comments(student_id: str) -> list[dict]:
-    """Load teacher comments for a student, enriched with teacher name and subject."""
-    comments_result = await supabase_client.query("teacher_comments") \
-        .select("id, comment_text, performance_rating, engagement_rating, teacher_id, class_id") \
-        .eq("student_id", student_id) \
-        .execute()
-
-    raw_comments = comments_result.get("data", [])
-    if not raw_comments:
-        return []
-
-    # Batch-load teacher names
-    teacher_ids = list(set(c["teacher_id"] for c in raw_comments if c.get("teacher_id")))
-    teacher_name_map = {}
-    if teacher_ids:
-        teachers_result = await supabase_client.query("profiles") \
-            .select("id, full_name") \
-            .in_("id", teacher_ids) \
-            .execute()
-        teacher_name_map = {t["id"]: t.get("full_name", "Unknown") for t in teachers_result.get("data", [])}
-
-    # Batch-load class→subject mapping
-    class_ids = list(set(c["class_id"] for c in raw_comments if c.get("class_id")))
-    subject_name_map = {}
-    if class_ids:
-        classes_result = await supabase_client.query("classes") \
-            .select("id, subjects(name)") \
-            .in_("id", class_ids) \
-            .execute()
-        for cls in classes_result.get("data", []):
-            subj = cls.get("subjects")
-            if subj:
-                subject_name_map[cls["id"]] = subj["name"]
-
-    teacher_comments = []
-    for c in raw_comments:
-        teacher_comments.append({
-            "teacher_name": teacher_name_map.get(c.get("teacher_id"), "Unknown"),
-            "subject_name": subject_name_map.get(c.get("class_id"), "Unknown"),
-            "comment_text": c.get("comment_text", ""),
-            "performance_rating": c.get("performance_rating"),
-            "engagement_rating": c.get("engagement_rating"),
-        })
-
-    return teacher_comments
-
-
-async def _load_subject_enrolments(student_id: str) -> list[dict]:
-    """Load a student's subject enrolments from student_classes → classes → subjects."""
-    sc_result = await supabase_client.query("student_classes") \
-        .select("class_id, grade") \
-        .eq("student_id", student_id) \
-        .execute()
-
-    enrollments = sc_result.get("data", [])
-    if not enrollments:
-        return []
-
-    class_ids = [e["class_id"] for e in enrollments]
-    grade_by_class = {e["class_id"]: e.get("grade") for e in enrollments}
-
-    classes_result = await supabase_client.query("classes") \
-        .select("id, year_level, subjects(name)") \
-        .in_("id", class_ids) \
-        .execute()
-
-    subject_enrolments = []
-    for cls in classes_result.get("data", []):
-        subj = cls.get("subjects")
-        if subj:
-            subject_enrolments.append({
-                "subject_name": subj["name"],
-                "year_level": cls.get("year_level", "?"),
-                "grade": grade_by_class.get(cls["id"]),
-            })
-
-    return subject_enrolments
+@coalesce
+async def _load_analysis_input(student_id: str) -> dict:
+    """
+    Load everything an analysis run needs via the prepare_analysis_input RPC.
+    Returns { teacher_status, assessment (or None), teacher_comments, subject_enrolments }.
+    """
+    result = await supabase_client.rpc("prepare_analysis_input", {"_student": student_id}).execute()
+    if result.get("error"):
+        raise Exception(result["error"])
+    return result["data"][0]
 
 
 def _map_analysis_for_frontend(row: dict) -> dict:
@@ -2501,25 +2281,62 @@ def _map_analysis_for_frontend(row: dict) -> dict:
     row["strengths"] = row.get("strength_profile")
     row["gaps"] = row.get("gap_analysis")
     row["strength_narrative"] = row.get("overall_narrative")
+    # Rows stored before weighting_explanation became jsonb hold it as a serialised JSON string
+    if isinstance(row.get("weighting_explanation"), str):
+        row["weighting_explanation"] = json.loads(row["weighting_explanation"])
 
     # Reconstruct career_explanations from stored final_ranking
-    final_ranking = row.get("final_ranking") or []
     det_top20 = {e["soc_code"]: e["score"] for e in (row.get("deterministic_top20") or [])}
-    career_explanations = {}
-    for entry in final_ranking:
-        soc = entry.get("soc_code", "")
-        career_explanations[soc] = {
+    row["career_explanations"] = {
+        (soc := entry.get("soc_code", "")): {
             "title": entry.get("career_name", ""),
             "score": det_top20.get(soc, 0),
             "rank": entry.get("rank", 0),
             "explanation": entry.get("reasoning", ""),
         }
-    row["career_explanations"] = career_explanations
+        for entry in row.get("final_ranking") or []
+    }
     return row
 
 
+async def _analysis_response(request: Request, student_id: str):
+    """
+    Stored analysis for a student, tagged with a weak ETag from its analysis_version.
+    Checks the version first so an unchanged analysis returns 304 without loading the row.
+    """
+    version_result = await supabase_client.query("student_analyses") \
+        .select("analysis_version") \
+        .eq("student_id", student_id) \
+        .execute()
+    if version_result.get("error"):
+        raise Exception(version_result["error"])
+    if not version_result["data"]:
+        return {"analysis": None}
+
+    cached = not_modified(request, weak_etag(f"{student_id}-{version_result['data'][0]['analysis_version']}"))
+    if cached:
+        return cached
+
+    result = await supabase_client.query("student_analyses") \
+        .select("*") \
+        .eq("student_id", student_id) \
+        .execute()
+
+    if not result.get("data"):
+        return {"analysis": None}
+
+    row = result["data"][0]
+    # Tag with the version actually returned, in case it changed since the check
+    return versioned_response(
+        {"analysis": _map_analysis_for_frontend(row)}, f"{student_id}-{row['analysis_version']}"
+    )
+
+
 async def _store_analysis(student_id: str, school_id: str, answers: dict, result: dict):
-    """Store analysis result in student_analyses table (upsert)."""
+    """
+    Store analysis result in student_analyses table (upsert).
+    Runs as a background task after the response is sent, so failures are retried once and logged.
+    """
     analysis_data = {
         "student_id": student_id,
         "school_id": school_id,
@@ -2531,30 +2348,21 @@ async def _store_analysis(student_id: str, school_id: str, answers: dict, result
         "strength_profile": result.get("strength_profile"),
         "gap_analysis": result.get("gap_analysis"),
         "conflict_notes": result.get("conflicts"),
-        "weighting_explanation": json.dumps(result.get("data_weighting")) if result.get("data_weighting") else None,
+        "weighting_explanation": result.get("data_weighting") or None,
         "overall_narrative": result.get("overall_narrative"),
         "confidence_score": result.get("confidence_score", 0.5),
         "data_sources_used": result.get("data_sources_used"),
         "deterministic_top20": result.get("deterministic_top20"),
     }
 
-    existing = await supabase_client.query("student_analyses") \
-        .select("id, analysis_version") \
-        .eq("student_id", student_id) \
-        .execute()
-
-    if existing.get("data"):
-        current_version = existing["data"][0].get("analysis_version", 1)
-        analysis_data["analysis_version"] = current_version + 1
-        await supabase_client.query("student_analyses") \
-            .update(analysis_data) \
-            .eq("id", existing["data"][0]["id"]) \
-            .execute()
-    else:
-        analysis_data["analysis_version"] = 1
-        await supabase_client.query("student_analyses") \
-            .insert(analysis_data) \
+    # analysis_version is set by a trigger (1 on insert, +1 on update)
+    for _attempt in range(2):
+        stored = await supabase_client.query("student_analyses") \
+            .upsert(analysis_data, on_conflict="student_id") \
             .execute()
+        if not stored.get("error"):
+            return
+    logger.error("Storing analysis for %s failed: %s", student_id, stored["error"])
 
 
 # ── Follow-up question endpoints ──────────────────────────────────
@@ -2589,7 +2397,7 @@ async def check_follow_up_questions(
         }
 
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Follow-up check failed for %s", profile.id)
         raise HTTPException(status_code=500, detail=f"Follow-up check error: {str(e)}")
 
 
@@ -2629,7 +2437,7 @@ async def submit_follow_up_answers(
     except HTTPException:
         raise
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Follow-up save failed for %s", profile.id)
         raise HTTPException(status_code=500, detail=f"Follow-up save error: {str(e)}")
 
 
@@ -2637,6 +2445,7 @@ async def submit_follow_up_answers(
 
 @app.post("/student/analysis")
 async def trigger_student_analysis(
+    background_tasks: BackgroundTasks,
     profile: Profile = Depends(require_student)
 ):
     """
@@ -2644,8 +2453,11 @@ async def trigger_student_analysis(
     Requires all teachers to have commented first.
     """
     try:
+        # Teacher status, assessment (including follow-up answers), comments and subjects in one call
+        analysis_input = await _load_analysis_input(profile.id)
+
         # Check teacher gating
-        teacher_status = await _get_teacher_status(profile.id)
+        teacher_status = analysis_input["teacher_status"]
         if not teacher_status["all_commented"]:
             missing_count = teacher_status["total_teachers"] - teacher_status["commented_teachers"]
             raise HTTPException(
@@ -2653,62 +2465,47 @@ async def trigger_student_analysis(
                 detail=f"Waiting for {missing_count} teacher(s) to submit comments before analysis can run."
             )
 
-        # Load assessment (including follow-up answers)
-        assessment_result = await supabase_client.query("assessment_results") \
-            .select("raw_answers, follow_up_answers") \
-            .eq("user_id", profile.id) \
-            .execute()
-
-        if not assessment_result.get("data"):
+        assessment = analysis_input["assessment"]
+        if not assessment:
             raise HTTPException(status_code=400, detail="No assessment found. Please complete the assessment first.")
 
-        answers = assessment_result["data"][0].get("raw_answers", {})
+        answers = assessment.get("raw_answers", {})
         if not answers:
             raise HTTPException(status_code=400, detail="Assessment data is empty.")
 
-        follow_up = assessment_result["data"][0].get("follow_up_answers")
+        follow_up = assessment.get("follow_up_answers")
 
         # Run deterministic engine → top 20
         user_profile = convert_answers_to_profile(answers)
-        _results, raw_ranking = rank_profiles(user_profile)
+        _results, raw_ranking = await asyncio.to_thread(rank_profiles, user_profile)
         top_20 = raw_ranking[:20]
 
-        # Load teacher comments (raw text for AI)
-        comments = await _load_teacher_comments(profile.id)
-
-        # Load subject enrolments
-        subjects = await _load_subject_enrolments(profile.id)
-
         # Run AI analysis
-        result = await run_analysis(answers, top_20, comments, subjects, follow_up_answers=follow_up)
+        result = await run_analysis(
+            answers, top_20, analysis_input["teacher_comments"], analysis_input["subject_enrolments"],
+            follow_up_answers=follow_up,
+        )
 
-        # Store in student_analyses
-        await _store_analysis(profile.id, profile.school_id, answers, result)
+        # Store in student_analyses after responding
+        background_tasks.add_task(_store_analysis, profile.id, profile.school_id, answers, result)
 
         return result
 
     except HTTPException:
         raise
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Analysis failed for %s", profile.id)
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 
 @app.get("/student/analysis")
 async def get_student_analysis(
+    request: Request,
     profile: Profile = Depends(require_student)
 ):
     """Retrieve stored analysis for the current student."""
     try:
-        result = await supabase_client.query("student_analyses") \
-            .select("*") \
-            .eq("student_id", profile.id) \
-            .execute()
-
-        if not result.get("data"):
-            return {"analysis": None}
-
-        return {"analysis": _map_analysis_for_frontend(result["data"][0])}
+        return await _analysis_response(request, profile.id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
@@ -2716,28 +2513,19 @@ async def get_student_analysis(
 @app.get("/student/{student_id}/analysis")
 async def get_student_analysis_by_id(
     student_id: str,
+    request: Request,
     profile: Profile = Depends(require_profile)
 ):
     """Retrieve stored analysis for a student. Accessible by the student, their teachers, or admin."""
     try:
         # Verify access: student can view own, admin can view school, teacher can view their students
-        if profile.role == "student" and profile.id != student_id:
+        if profile.role == UserRole.STUDENT and profile.id != student_id:
             raise HTTPException(status_code=403, detail="You can only view your own analysis.")
-        elif profile.role == "admin":
-            student_check = await supabase_client.query("profiles") \
-                .select("id").eq("id", student_id).eq("school_id", profile.school_id).execute()
-            if not student_check.get("data"):
+        elif profile.role == UserRole.ADMIN:
+            if not await student_ownership.load(profile.school_id, student_id):
                 raise HTTPException(status_code=404, detail="Student not found in your school.")
 
-        result = await supabase_client.query("student_analyses") \
-            .select("*") \
-            .eq("student_id", student_id) \
-            .execute()
-
-        if not result.get("data"):
-            return {"analysis": None}
-
-        return {"analysis": _map_analysis_for_frontend(result["data"][0])}
+        return await _analysis_response(request, student_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -2747,58 +2535,48 @@ async def get_student_analysis_by_id(
 @app.post("/admin/trigger-analysis/{student_id}")
 async def admin_trigger_analysis(
     student_id: str,
+    background_tasks: BackgroundTasks,
     profile: Profile = Depends(require_admin)
 ):
     """Admin triggers re-analysis for a student (bypasses teacher gating)."""
     try:
-        # Verify student belongs to school
-        student_check = await supabase_client.query("profiles") \
-            .select("id, school_id") \
-            .eq("id", student_id) \
-            .eq("school_id", profile.school_id) \
-            .execute()
-
-        if not student_check.get("data"):
+        # Verify student belongs to school before reading any of their data
+        if not await student_ownership.load(profile.school_id, student_id):
             raise HTTPException(status_code=404, detail="Student not found")
 
-        # Load assessment (including follow-up answers)
-        assessment_result = await supabase_client.query("assessment_results") \
-            .select("raw_answers, follow_up_answers") \
-            .eq("user_id", student_id) \
-            .execute()
+        # Assessment (including follow-up answers), teacher comments (no gating check) and subjects
+        analysis_input = await _load_analysis_input(student_id)
 
-        if not assessment_result.get("data"):
+        assessment = analysis_input["assessment"]
+        if not assessment:
             raise HTTPException(status_code=400, detail="No assessment found for this student.")
 
-        answers = assessment_result["data"][0].get("raw_answers", {})
+        answers = assessment.get("raw_answers", {})
         if not answers:
             raise HTTPException(status_code=400, detail="Assessment data is empty.")
 
-        follow_up = assessment_result["data"][0].get("follow_up_answers")
+        follow_up = assessment.get("follow_up_answers")
 
         # Run deterministic engine → top 20
         user_profile = convert_answers_to_profile(answers)
-        _results, raw_ranking = rank_profiles(user_profile)
+        _results, raw_ranking = await asyncio.to_thread(rank_profiles, user_profile)
         top_20 = raw_ranking[:20]
 
-        # Load teacher comments (no gating check)
-        comments = await _load_teacher_comments(student_id)
-
-        # Load subject enrolments
-        subjects = await _load_subject_enrolments(student_id)
-
         # Run AI analysis
-        result = await run_analysis(answers, top_20, comments, subjects, follow_up_answers=follow_up)
+        result = await run_analysis(
+            answers, top_20, analysis_input["teacher_comments"], analysis_input["subject_enrolments"],
+            follow_up_answers=follow_up,
+        )
 
-        # Store result
-        await _store_analysis(student_id, profile.school_id, answers, result)
+        # Store result after responding
+        background_tasks.add_task(_store_analysis, student_id, profile.school_id, answers, result)
 
         return result
 
     except HTTPException:
         raise
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Admin-triggered analysis failed for %s", student_id)
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 
@@ -2829,7 +2607,7 @@ async def test_follow_up_questions(request: AssessmentSubmission):
             "quality": quality,
         }
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Test follow-up check failed")
         raise HTTPException(status_code=500, detail=f"Follow-up check error: {str(e)}")
 
 
@@ -2852,23 +2630,16 @@ async def test_analysis(request: TestAnalysisRequest):
         answers = request.answers
 
         # Validate answers
-        required_ids = (
-            [f"A{i}" for i in range(1, 6)] +
-            [f"I{i}" for i in range(1, 7)] +
-            [f"T{i}" for i in range(1, 7)] +
-            [f"V{i}" for i in range(1, 7)] +
-            [f"W{i}" for i in range(1, 5)]
-        )
-        missing = [qid for qid in required_ids if qid not in answers]
+        missing = REQUIRED_ASSESSMENT_IDS.difference(answers)
         if missing:
             raise HTTPException(
                 status_code=400,
-                detail=f"Missing required questions: {', '.join(missing)}"
+                detail=f"Missing required questions: {', '.join(sorted(missing))}"
             )
 
         # Run deterministic engine → top 20
         user_profile = convert_answers_to_profile(answers)
-        _results, raw_ranking = rank_profiles(user_profile)
+        _results, raw_ranking = await asyncio.to_thread(rank_profiles, user_profile)
         top_20 = raw_ranking[:20]
 
         # Run AI analysis with provided data
@@ -2885,7 +2656,7 @@ async def test_analysis(request: TestAnalysisRequest):
     except HTTPException:
         raise
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Test analysis failed")
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 
@@ -0,0 +1,15 @@
+-- Replace a student's career aspirations atomically in a single call.
+-- Used by PUT /student/career-aspirations.
+create or replace function public.replace_student_aspirations(_student uuid, _rows jsonb)
+returns void
+language plpgsql
+set search_path = public
+as $$
+begin
+    delete from student_career_aspirations where student_id = _student;
+
+    insert into student_career_aspirations (student_id, soc_code, title)
+    select _student, x->>'soc_code', x->>'title'
+    from jsonb_array_elements(coalesce(_rows, '[]'::jsonb)) as x;
+end;
+$$;
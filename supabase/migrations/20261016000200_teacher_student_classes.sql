@@ -0,0 +1,24 @@
+-- One row per (teacher, student, class) relationship, with the names the
+-- teacher-facing endpoints display. Lets "is this one of my students" be a
+-- single indexed lookup instead of a chain of queries.
+-- security_invoker so the view doesn't bypass RLS on the underlying tables by running as its owner.
+create or replace view public.teacher_student_classes
+with (security_invoker = true) as
+select
+    c.teacher_id,
+    sc.student_id,
+    c.id         as class_id,
+    c.class_name,
+    s.name       as subject_name
+from classes c
+join student_classes sc on sc.class_id = c.id
+join subjects s on s.id = c.subject_id;
+
+-- Only read by the backend (service key); keep it off the anon/authenticated REST API
+revoke all on public.teacher_student_classes from anon, authenticated;
+
+create index if not exists student_classes_class_id_student_id_idx
+    on student_classes (class_id, student_id);
+
+create index if not exists classes_teacher_id_idx
+    on classes (teacher_id);
@@ -0,0 +1,15 @@
+-- Replace a student's class enrolments atomically in a single call.
+-- Used by PUT /admin/student/{student_id}.
+create or replace function public.replace_student_classes(_student uuid, _classes uuid[])
+returns void
+language plpgsql
+set search_path = public
+as $$
+begin
+    delete from student_classes where student_id = _student;
+
+    insert into student_classes (student_id, class_id)
+    select _student, c
+    from unnest(coalesce(_classes, '{}'::uuid[])) as c;
+end;
+$$;
@@ -0,0 +1,40 @@
+-- Validate and replace a student's class enrolments in one call.
+-- Every class must belong to the school and match the student's year level;
+-- otherwise raises 'class_not_found' / 'class_mismatch' and nothing changes.
+-- Used by PUT /admin/student/{student_id}.
+drop function if exists public.replace_student_classes(uuid, uuid[]);
+
+create or replace function public.replace_student_classes(
+    _student uuid,
+    _school uuid,
+    _year_level text,
+    _classes uuid[]
+)
+returns void
+language plpgsql
+set search_path = public
+as $$
+declare
+    _wanted int := coalesce(array_length(_classes, 1), 0);
+begin
+    if _wanted > 0 then
+        if (select count(*) from classes where id = any(_classes) and school_id = _school) <> _wanted then
+            raise exception 'class_not_found';
+        end if;
+
+        if exists (
+            select 1 from classes
+            where id = any(_classes)
+              and (nullif(year_level::text, '') is null or year_level::text is distinct from _year_level)
+        ) then
+            raise exception 'class_mismatch';
+        end if;
+    end if;
+
+    delete from student_classes where student_id = _student;
+
+    insert into student_classes (student_id, class_id)
+    select _student, c
+    from unnest(coalesce(_classes, '{}'::uuid[])) as c;
+end;
+$$;
@@ -0,0 +1,38 @@
+-- One row per student in a school with class membership and assessment/comment flags.
+-- Used by GET /admin/students.
+create or replace function public.admin_students_overview(_school uuid)
+returns table (
+    id uuid,
+    full_name text,
+    email text,
+    year_level text,
+    class_ids uuid[],
+    class_names text[],
+    has_assessment boolean,
+    has_teacher_comment boolean
+)
+language sql
+stable
+set search_path = public
+as $$
+    select
+        p.id,
+        p.full_name,
+        p.email,
+        p.year_level::text,
+        coalesce(sc.class_ids, '{}'),
+        coalesce(sc.class_names, '{}'),
+        exists (select 1 from assessment_results ar where ar.user_id = p.id),
+        exists (select 1 from teacher_comments tc where tc.student_id = p.id)
+    from profiles p
+    left join lateral (
+        select
+            array_agg(c.id order by c.class_name) as class_ids,
+            array_agg(coalesce(c.class_name, '') order by c.class_name) as class_names
+        from student_classes s
+        join classes c on c.id = s.class_id
+        where s.student_id = p.id
+    ) sc on true
+    where p.school_id = _school
+      and p.role = 'student';
+$$;
@@ -0,0 +1,34 @@
+-- Cheap change token for the admin student detail and portfolio views, used as a weak ETag.
+-- Changes whenever the profile, assessment, comments (or a commenting teacher's name), class enrolments
+-- (or their subject's name/category) or portfolio change.
+-- Returns null when the student is not in the school.
+create or replace function public.student_details_version(_student uuid, _school uuid)
+returns text
+language sql
+stable
+set search_path = public
+as $$
+    select md5(concat_ws('|',
+        p.full_name,
+        p.email,
+        p.year_level::text,
+        (select max(a.updated_at)::text from assessment_results a where a.user_id = p.id),
+        (select count(*)::text || ':' || coalesce(max(c.updated_at)::text, '') || ':'
+                || coalesce(string_agg(distinct concat_ws(':', c.teacher_id, t.full_name), ','
+                                       order by concat_ws(':', c.teacher_id, t.full_name)), '')
+         from teacher_comments c
+         left join profiles t on t.id = c.teacher_id
+         where c.student_id = p.id),
+        (select string_agg(
+                    concat_ws(':', sc.class_id, cl.class_name, cl.year_level, cl.subject_id, s.name, s.category),
+                    ',' order by sc.class_id)
+         from student_classes sc
+         join classes cl on cl.id = sc.class_id
+         left join subjects s on s.id = cl.subject_id
+         where sc.student_id = p.id),
+        (select max(sp.updated_at)::text from student_portfolios sp where sp.student_id = p.id)
+    ))
+    from profiles p
+    where p.id = _student
+      and p.school_id = _school;
+$$;
@@ -0,0 +1,129 @@
+-- Per-student has_assessment / has_teacher_comment flags, kept current by triggers so the
+-- admin student list reads one indexed row per student instead of probing both tables.
+-- A plain table (not a materialized view) so each change updates one row rather than refreshing all.
+create table if not exists public.student_flags (
+    student_id uuid primary key references public.profiles (id) on delete cascade,
+    has_assessment boolean not null default false,
+    has_teacher_comment boolean not null default false
+);
+
+-- Only reached through admin_students_overview (service key); no direct client access
+alter table public.student_flags enable row level security;
+
+create or replace function public.refresh_student_flags(_student uuid)
+returns void
+language sql
+security definer
+set search_path = public
+as $$
+    insert into student_flags (student_id, has_assessment, has_teacher_comment)
+    select
+        p.id,
+        exists (select 1 from assessment_results ar where ar.user_id = p.id),
+        exists (select 1 from teacher_comments tc where tc.student_id = p.id)
+    from profiles p
+    where p.id = _student
+    on conflict (student_id) do update
+        set has_assessment = excluded.has_assessment,
+            has_teacher_comment = excluded.has_teacher_comment;
+$$;
+
+create or replace function public.student_flags_assessment_trigger()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform refresh_student_flags(old.user_id);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.user_id is distinct from old.user_id then
+        perform refresh_student_flags(new.user_id);
+    end if;
+    return null;
+end;
+$$;
+
+create or replace function public.student_flags_comment_trigger()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform refresh_student_flags(old.student_id);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.student_id is distinct from old.student_id then
+        perform refresh_student_flags(new.student_id);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists student_flags_assessment on public.assessment_results;
+create trigger student_flags_assessment
+    after insert or delete or update of user_id on public.assessment_results
+    for each row execute function public.student_flags_assessment_trigger();
+
+drop trigger if exists student_flags_comment on public.teacher_comments;
+create trigger student_flags_comment
+    after insert or delete or update of student_id on public.teacher_comments
+    for each row execute function public.student_flags_comment_trigger();
+
+-- Internal helpers: security definer, so they must not be callable through /rest/v1/rpc
+revoke execute on function public.refresh_student_flags(uuid) from public, anon, authenticated;
+revoke execute on function public.student_flags_assessment_trigger() from public, anon, authenticated;
+revoke execute on function public.student_flags_comment_trigger() from public, anon, authenticated;
+
+-- Backfill existing students
+insert into public.student_flags (student_id, has_assessment, has_teacher_comment)
+select
+    p.id,
+    exists (select 1 from public.assessment_results ar where ar.user_id = p.id),
+    exists (select 1 from public.teacher_comments tc where tc.student_id = p.id)
+from public.profiles p
+where p.role = 'student'
+on conflict (student_id) do update
+    set has_assessment = excluded.has_assessment,
+        has_teacher_comment = excluded.has_teacher_comment;
+
+-- Read the flags instead of probing assessment_results / teacher_comments per student
+create or replace function public.admin_students_overview(_school uuid)
+returns table (
+    id uuid,
+    full_name text,
+    email text,
+    year_level text,
+    class_ids uuid[],
+    class_names text[],
+    has_assessment boolean,
+    has_teacher_comment boolean
+)
+language sql
+stable
+set search_path = public
+as $$
+    select
+        p.id,
+        p.full_name,
+        p.email,
+        p.year_level::text,
+        coalesce(sc.class_ids, '{}'),
+        coalesce(sc.class_names, '{}'),
+        coalesce(f.has_assessment, false),
+        coalesce(f.has_teacher_comment, false)
+    from profiles p
+    left join student_flags f on f.student_id = p.id
+    left join lateral (
+        select
+            array_agg(c.id order by c.class_name) as class_ids,
+            array_agg(coalesce(c.class_name, '') order by c.class_name) as class_names
+        from student_classes s
+        join classes c on c.id = s.class_id
+        where s.student_id = p.id
+    ) sc on true
+    where p.school_id = _school
+      and p.role = 'student';
+$$;
@@ -0,0 +1,198 @@
+-- One denormalised row per class for the admin class list and reports:
+-- subject and teacher names plus the enrolment count.
+-- A plain table kept current row by row by triggers (like student_flags), not a materialized view:
+-- a refresh would recompute every school's classes and lock the view on each roster or profile write.
+create table if not exists public.admin_class_summary as
+select
+    c.id,
+    c.school_id,
+    c.class_name,
+    c.year_level,
+    c.subject_id,
+    coalesce(s.name, '') as subject_name,
+    coalesce(s.category, '') as subject_category,
+    c.teacher_id,
+    coalesce(p.full_name, '') as teacher_name,
+    0::bigint as student_count
+from public.classes c
+left join public.subjects s on s.id = c.subject_id
+left join public.profiles p on p.id = c.teacher_id
+with no data;
+
+alter table public.admin_class_summary
+    add primary key (id),
+    alter column student_count set not null,
+    alter column student_count set default 0;
+create index if not exists admin_class_summary_school_id_idx on public.admin_class_summary (school_id);
+create index if not exists admin_class_summary_subject_id_idx on public.admin_class_summary (subject_id);
+create index if not exists admin_class_summary_teacher_id_idx on public.admin_class_summary (teacher_id);
+
+-- Only read by the backend (service key); no direct client access
+alter table public.admin_class_summary enable row level security;
+revoke all on public.admin_class_summary from anon, authenticated;
+
+-- Recompute one class's names (or drop its row if the class is gone).
+-- student_count is only set when the row is created; enrolment triggers adjust it by +-1 afterwards,
+-- since a recount here could race with a concurrent enrolment and store a stale total.
+create or replace function public.sync_admin_class_summary(_class uuid)
+returns void
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    insert into admin_class_summary (
+        id, school_id, class_name, year_level, subject_id, subject_name,
+        subject_category, teacher_id, teacher_name, student_count
+    )
+    select
+        c.id,
+        c.school_id,
+        c.class_name,
+        c.year_level,
+        c.subject_id,
+        coalesce(s.name, ''),
+        coalesce(s.category, ''),
+        c.teacher_id,
+        coalesce(p.full_name, ''),
+        (select count(*) from student_classes sc where sc.class_id = c.id)
+    from classes c
+    left join subjects s on s.id = c.subject_id
+    left join profiles p on p.id = c.teacher_id
+    where c.id = _class
+    on conflict (id) do update
+        set school_id = excluded.school_id,
+            class_name = excluded.class_name,
+            year_level = excluded.year_level,
+            subject_id = excluded.subject_id,
+            subject_name = excluded.subject_name,
+            subject_category = excluded.subject_category,
+            teacher_id = excluded.teacher_id,
+            teacher_name = excluded.teacher_name;
+
+    if not found then
+        delete from admin_class_summary where id = _class;
+    end if;
+end;
+$$;
+
+create or replace function public.admin_class_summary_classes_trigger()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op = 'DELETE' then
+        delete from admin_class_summary where id = old.id;
+    else
+        perform sync_admin_class_summary(new.id);
+    end if;
+    return null;
+end;
+$$;
+
+create or replace function public.admin_class_summary_student_classes_trigger()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update admin_class_summary set student_count = student_count - 1 where id = old.class_id;
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        update admin_class_summary set student_count = student_count + 1 where id = new.class_id;
+    end if;
+    return null;
+end;
+$$;
+
+create or replace function public.admin_class_summary_subjects_trigger()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op = 'DELETE' then
+        update admin_class_summary set subject_name = '', subject_category = '' where subject_id = old.id;
+    else
+        update admin_class_summary
+        set subject_name = coalesce(new.name, ''), subject_category = coalesce(new.category, '')
+        where subject_id = new.id;
+    end if;
+    return null;
+end;
+$$;
+
+create or replace function public.admin_class_summary_profiles_trigger()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op = 'DELETE' then
+        update admin_class_summary set teacher_name = '' where teacher_id = old.id;
+    else
+        update admin_class_summary set teacher_name = coalesce(new.full_name, '') where teacher_id = new.id;
+    end if;
+    return null;
+end;
+$$;
+
+-- Row-level: each write touches only the summary rows of the classes it affects
+drop trigger if exists admin_class_summary_classes on public.classes;
+create trigger admin_class_summary_classes
+    after insert or update or delete on public.classes
+    for each row execute function public.admin_class_summary_classes_trigger();
+
+drop trigger if exists admin_class_summary_student_classes on public.student_classes;
+create trigger admin_class_summary_student_classes
+    after insert or delete or update of class_id on public.student_classes
+    for each row execute function public.admin_class_summary_student_classes_trigger();
+
+drop trigger if exists admin_class_summary_subjects on public.subjects;
+create trigger admin_class_summary_subjects
+    after update of name, category or delete on public.subjects
+    for each row execute function public.admin_class_summary_subjects_trigger();
+
+drop trigger if exists admin_class_summary_profiles on public.profiles;
+create trigger admin_class_summary_profiles
+    after update of full_name or delete on public.profiles
+    for each row execute function public.admin_class_summary_profiles_trigger();
+
+-- Internal helpers: security definer, so they must not be callable through /rest/v1/rpc
+revoke execute on function public.sync_admin_class_summary(uuid) from public, anon, authenticated;
+revoke execute on function public.admin_class_summary_classes_trigger() from public, anon, authenticated;
+revoke execute on function public.admin_class_summary_student_classes_trigger() from public, anon, authenticated;
+revoke execute on function public.admin_class_summary_subjects_trigger() from public, anon, authenticated;
+revoke execute on function public.admin_class_summary_profiles_trigger() from public, anon, authenticated;
+
+-- Backfill existing classes, counting enrolments with one grouped scan of student_classes
+insert into public.admin_class_summary (
+    id, school_id, class_name, year_level, subject_id, subject_name,
+    subject_category, teacher_id, teacher_name, student_count
+)
+select
+    c.id,
+    c.school_id,
+    c.class_name,
+    c.year_level,
+    c.subject_id,
+    coalesce(s.name, ''),
+    coalesce(s.category, ''),
+    c.teacher_id,
+    coalesce(p.full_name, ''),
+    coalesce(n.student_count, 0)
+from public.classes c
+left join public.subjects s on s.id = c.subject_id
+left join public.profiles p on p.id = c.teacher_id
+left join (
+    select class_id, count(*) as student_count
+    from public.student_classes
+    group by class_id
+) n on n.class_id = c.id
+on conflict (id) do nothing;
@@ -0,0 +1,13 @@
+-- Number of classes per subject in a school. Used by GET /admin/subjects.
+create or replace function public.subject_class_counts(_school uuid)
+returns table (subject_id uuid, class_count bigint)
+language sql
+stable
+set search_path = public
+as $$
+    select c.subject_id, count(*)
+    from classes c
+    where c.school_id = _school
+      and c.subject_id is not null
+    group by c.subject_id;
+$$;
@@ -0,0 +1,21 @@
+-- Make a class's roster exactly _students in one transaction: remove students not listed,
+-- add listed students not yet enrolled. Existing enrolments are left untouched.
+-- Used by PUT /admin/class/{class_id}.
+create or replace function public.sync_class_roster(_class uuid, _students uuid[])
+returns void
+language plpgsql
+set search_path = public
+as $$
+begin
+    delete from student_classes
+    where class_id = _class
+      and student_id <> all (coalesce(_students, '{}'::uuid[]));
+
+    insert into student_classes (student_id, class_id)
+    select s, _class
+    from unnest(coalesce(_students, '{}'::uuid[])) as s
+    where not exists (
+        select 1 from student_classes sc where sc.class_id = _class and sc.student_id = s
+    );
+end;
+$$;
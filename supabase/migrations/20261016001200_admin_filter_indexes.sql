@@ -0,0 +1,22 @@
+-- Indexes for the filters the admin endpoints use on every request.
+-- classes(teacher_id) and student_classes(class_id, student_id) already exist
+-- (20261016000200_teacher_student_classes.sql); the latter also serves class_id-only lookups.
+-- Plain (non-concurrent) builds because migrations run inside a transaction.
+
+-- Student / teacher lists and counts: profiles?school_id=eq.X&role=eq.Y
+create index if not exists profiles_school_id_role_idx
+    on public.profiles (school_id, role);
+
+-- Class lists, stats and subject class counts
+create index if not exists classes_school_id_idx
+    on public.classes (school_id);
+create index if not exists classes_subject_id_idx
+    on public.classes (subject_id);
+
+-- A student's enrolments (details, class replacement, flags)
+create index if not exists student_classes_student_id_idx
+    on public.student_classes (student_id);
+
+-- Reports and stats: assessment_results?school_id=eq.X
+create index if not exists assessment_results_school_id_user_id_idx
+    on public.assessment_results (school_id, user_id);
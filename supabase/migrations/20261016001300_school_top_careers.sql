@@ -0,0 +1,18 @@
+-- Each ranked student's top career in a school, without shipping the full ranking.
+-- ranking is [[soc_code, career_name, score], ...]; the career columns are null when it is empty.
+-- Used by GET /admin/reports/summary.
+create or replace function public.school_top_careers(_school uuid)
+returns table (user_id uuid, soc_code text, career_name text, score double precision)
+language sql
+stable
+set search_path = public
+as $$
+    select
+        ar.user_id,
+        ar.ranking -> 0 ->> 0,
+        ar.ranking -> 0 ->> 1,
+        (ar.ranking -> 0 ->> 2)::double precision
+    from assessment_results ar
+    where ar.school_id = _school
+      and ar.ranking is not null;
+$$;
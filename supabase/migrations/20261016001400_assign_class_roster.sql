@@ -0,0 +1,72 @@
+-- Validate and set a class's roster in one call. Every student must be a student of the
+-- school in the class's year level; otherwise raises 'student_not_found' / 'student_mismatch'
+-- and nothing changes. Then removes students not listed and adds the missing ones.
+-- Used by PUT /admin/class/{class_id} and create_class_with_roster; supersedes sync_class_roster.
+create or replace function public.assign_class_roster(
+    _class uuid,
+    _school uuid,
+    _year_level text,
+    _students uuid[]
+)
+returns void
+language plpgsql
+set search_path = public
+as $$
+declare
+    _wanted int := coalesce(array_length(_students, 1), 0);
+begin
+    if _wanted > 0 then
+        if (
+            select count(*) from profiles
+            where id = any(_students) and school_id = _school and role = 'student'
+        ) <> _wanted then
+            raise exception 'student_not_found';
+        end if;
+
+        if exists (
+            select 1 from profiles
+            where id = any(_students)
+              and (nullif(year_level::text, '') is null or year_level::text is distinct from _year_level)
+        ) then
+            raise exception 'student_mismatch';
+        end if;
+    end if;
+
+    delete from student_classes
+    where class_id = _class
+      and student_id <> all (coalesce(_students, '{}'::uuid[]));
+
+    insert into student_classes (student_id, class_id)
+    select s, _class
+    from unnest(coalesce(_students, '{}'::uuid[])) as s
+    where not exists (
+        select 1 from student_classes sc where sc.class_id = _class and sc.student_id = s
+    );
+end;
+$$;
+
+-- Create a class and assign its roster in one transaction, so a rejected roster leaves no class behind.
+-- _class holds the classes columns to insert (school_id, subject_id, teacher_id, year_level, class_name).
+-- Returns the new classes row. Used by POST /admin/class.
+create or replace function public.create_class_with_roster(_class jsonb, _students uuid[])
+returns json
+language plpgsql
+set search_path = public
+as $$
+declare
+    _row classes;
+begin
+    insert into classes (school_id, subject_id, teacher_id, year_level, class_name)
+    select school_id, subject_id, teacher_id, year_level, class_name
+    from jsonb_populate_record(null::classes, _class)
+    returning * into _row;
+
+    if coalesce(array_length(_students, 1), 0) > 0 then
+        perform assign_class_roster(_row.id, _row.school_id, _row.year_level::text, _students);
+    end if;
+
+    return to_json(_row);
+end;
+$$;
+
+drop function if exists public.sync_class_roster(uuid, uuid[]);
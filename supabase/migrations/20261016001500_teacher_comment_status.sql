@@ -0,0 +1,36 @@
+-- How many of a student's class teachers have commented on them, and who is still missing.
+-- Returns { total_teachers, commented_teachers, all_commented, missing: [{id, name}] }.
+-- Used by GET /student/teacher-status and the analysis trigger.
+create or replace function public.teacher_comment_status(_student uuid)
+returns json
+language sql
+stable
+set search_path = public
+as $$
+    with teachers as (
+        select distinct c.teacher_id
+        from student_classes sc
+        join classes c on c.id = sc.class_id
+        where sc.student_id = _student
+          and c.teacher_id is not null
+    ),
+    pending as (
+        select t.teacher_id
+        from teachers t
+        where not exists (
+            select 1 from teacher_comments tc
+            where tc.student_id = _student and tc.teacher_id = t.teacher_id
+        )
+    )
+    select json_build_object(
+        'total_teachers', (select count(*) from teachers),
+        'commented_teachers', (select count(*) from teachers) - (select count(*) from pending),
+        'all_commented', not exists (select 1 from pending),
+        'missing', coalesce(
+            (select json_agg(json_build_object('id', p.id, 'name', p.full_name))
+             from pending
+             join profiles p on p.id = pending.teacher_id),
+            '[]'::json
+        )
+    );
+$$;
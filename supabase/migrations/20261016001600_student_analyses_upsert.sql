@@ -0,0 +1,31 @@
+-- One analysis row per student, so _store_analysis can upsert on student_id in a single request.
+-- analysis_version is maintained here: 1 on insert, previous + 1 on every update (including
+-- the update half of an upsert), so the client never reads it first.
+
+-- Keep the newest row if concurrent first-time analyses ever inserted duplicates
+delete from public.student_analyses sa
+using public.student_analyses newer
+where newer.student_id = sa.student_id
+  and (newer.analysis_version, newer.ctid) > (sa.analysis_version, sa.ctid);
+
+create unique index if not exists student_analyses_student_id_key
+    on public.student_analyses (student_id);
+
+create or replace function public.bump_analysis_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        new.analysis_version := 1;
+    else
+        new.analysis_version := coalesce(old.analysis_version, 0) + 1;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists student_analyses_version on public.student_analyses;
+create trigger student_analyses_version
+    before insert or update on public.student_analyses
+    for each row execute function public.bump_analysis_version();
@@ -0,0 +1,12 @@
+-- Indexes for the per-student lookups behind teacher status and analysis runs.
+-- classes(teacher_id) already exists (20261016000200_teacher_student_classes.sql).
+
+-- A student's enrolments with their grades (subject enrolments, teacher status, flags).
+-- Covering, so it replaces the plain student_id index from 20261016001200_admin_filter_indexes.sql.
+create index if not exists student_classes_student_id_covering_idx
+    on public.student_classes (student_id) include (class_id, grade);
+drop index if exists public.student_classes_student_id_idx;
+
+-- Comments on a student, and whether a given teacher has commented
+create index if not exists teacher_comments_student_id_teacher_id_idx
+    on public.teacher_comments (student_id, teacher_id);
@@ -0,0 +1,46 @@
+-- Everything an analysis run reads about a student, in one call:
+-- { teacher_status, assessment: {raw_answers, follow_up_answers} | null,
+--   teacher_comments: [{teacher_name, subject_name, comment_text, performance_rating, engagement_rating}],
+--   subject_enrolments: [{subject_name, year_level, grade}] }.
+-- Used by POST /student/analysis and POST /admin/trigger-analysis/{student_id}.
+create or replace function public.prepare_analysis_input(_student uuid)
+returns json
+language sql
+stable
+set search_path = public
+as $$
+    select json_build_object(
+        'teacher_status', teacher_comment_status(_student),
+        'assessment', (
+            select json_build_object('raw_answers', ar.raw_answers, 'follow_up_answers', ar.follow_up_answers)
+            from assessment_results ar
+            where ar.user_id = _student
+            limit 1
+        ),
+        'teacher_comments', coalesce((
+            select json_agg(json_build_object(
+                'teacher_name', case when p.id is null then 'Unknown' else p.full_name end,
+                'subject_name', coalesce(s.name, 'Unknown'),
+                'comment_text', tc.comment_text,
+                'performance_rating', tc.performance_rating,
+                'engagement_rating', tc.engagement_rating
+            ))
+            from teacher_comments tc
+            left join profiles p on p.id = tc.teacher_id
+            left join classes c on c.id = tc.class_id
+            left join subjects s on s.id = c.subject_id
+            where tc.student_id = _student
+        ), '[]'::json),
+        'subject_enrolments', coalesce((
+            select json_agg(json_build_object(
+                'subject_name', s.name,
+                'year_level', c.year_level,
+                'grade', sc.grade
+            ))
+            from student_classes sc
+            join classes c on c.id = sc.class_id
+            join subjects s on s.id = c.subject_id
+            where sc.student_id = _student
+        ), '[]'::json)
+    );
+$$;
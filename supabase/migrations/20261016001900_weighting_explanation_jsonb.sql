@@ -0,0 +1,12 @@
+-- Store student_analyses.weighting_explanation as jsonb rather than a serialised JSON string,
+-- so _store_analysis can send the data_weighting object as-is.
+-- Rows written before this hold json.dumps() output; whether the column was text, json or jsonb,
+-- that parses to a jsonb *string*, so unwrap those to the object they encode.
+-- (A type change rewrites the table without firing triggers, so analysis_version / ETags are kept.)
+alter table public.student_analyses
+    alter column weighting_explanation type jsonb
+    using case
+        when jsonb_typeof(nullif(weighting_explanation::text, '')::jsonb) = 'string'
+            then (nullif(weighting_explanation::text, '')::jsonb #>> '{}')::jsonb
+        else nullif(weighting_explanation::text, '')::jsonb
+    end;
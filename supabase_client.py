@@ -4,7 +4,8 @@ Uses Supabase to verify user tokens (no local JWT decoding)
 """
 import os
 import httpx
-from typing import Optional, Dict, List, Any
+import orjson
+from typing import Optional, Dict, Iterable, Any
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,6 +18,13 @@ if not SUPABASE_URL:
 if not SUPABASE_SECRET_KEY:
     raise ValueError("SUPABASE_SECRET_KEY environment variable is required")
 
+# Connection pool size per worker; keep workers x max connections under the project's connection cap.
+# HTTP/2 multiplexes concurrent queries over each connection, so a small pool goes a long way.
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "10"))
+# Seconds an idle connection stays open; longer than httpx's 5s default so bursts of analysis runs reuse them
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+
 
 class SupabaseClient:
     """Simple Supabase REST API client"""
@@ -24,7 +32,16 @@ class SupabaseClient:
     def __init__(self, url: str, key: str):
         self.url = url.rstrip('/')
         self.key = key
-        self.client = httpx.AsyncClient(timeout=120.0)  # Increased for heavy computations
+        # One long-lived keep-alive pool shared by every query; closed on app shutdown
+        self.client = httpx.AsyncClient(
+            timeout=120.0,  # Increased for heavy computations
+            limits=httpx.Limits(
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            http2=True,
+        )
 
     async def verify_user_token(self, user_token: str) -> Optional[Dict]:
         """
@@ -78,6 +95,21 @@ class SupabaseClient:
         """Start a query on a table"""
         return QueryBuilder(self, table, user_token)
 
+    def rpc(self, function: str, params: Optional[Dict] = None, user_token: Optional[str] = None) -> 'QueryBuilder':
+        """Call a Postgres function exposed by PostgREST (single round trip, runs in one transaction)"""
+        builder = QueryBuilder(self, f"rpc/{function}", user_token)
+        builder.method = "RPC"
+        builder.body = params or {}
+        return builder
+
+    async def exists(self, table: str, **filters: Any) -> bool:
+        """True if any row matches the equality filters (HEAD + count, so no rows are transferred)"""
+        builder = self.query(table).select("id", count="exact", head=True)
+        for column, value in filters.items():
+            builder.eq(column, value)
+        result = await builder.execute()
+        return bool(result.get("count"))
+
     async def close(self):
         """Close HTTP client"""
         await self.client.aclose()
@@ -94,10 +126,18 @@ class QueryBuilder:
         self.params = {}
         self.method = "GET"
         self.body = None
+        self.count = None
 
-    def select(self, columns: str = "*") -> 'QueryBuilder':
-        """Select columns"""
+    def select(self, columns: str = "*", count: Optional[str] = None, head: bool = False) -> 'QueryBuilder':
+        """
+        Select columns.
+        count: "exact", "planned" or "estimated" - report the total row count as result["count"]
+        head: Send a HEAD request so only the count comes back, with no row body
+        """
         self.params["select"] = columns
+        self.count = count
+        if head:
+            self.method = "HEAD"
         return self
 
     def eq(self, column: str, value: Any) -> 'QueryBuilder':
@@ -105,12 +145,23 @@ class QueryBuilder:
         self.params[column] = f"eq.{value}"
         return self
 
-    def in_(self, column: str, values: List[Any]) -> 'QueryBuilder':
-        """Filter: column in list"""
-        values_str = ",".join([f'"{v}"' if isinstance(v, str) else str(v) for v in values])
+    def in_(self, column: str, values: Iterable[Any]) -> 'QueryBuilder':
+        """Filter: column in values (any iterable, e.g. a list or dict.fromkeys(...) used as an ordered set)"""
+        values_str = ",".join(f'"{v}"' if isinstance(v, str) else str(v) for v in values)
         self.params[column] = f"in.({values_str})"
         return self
 
+    def order(self, *columns: str) -> 'QueryBuilder':
+        """Sort by columns, e.g. order("full_name", "id.desc")"""
+        self.params["order"] = ",".join(columns)
+        return self
+
+    def range(self, start: int, end: int) -> 'QueryBuilder':
+        """Return only rows start..end (inclusive, zero-based); also applies to RPC results"""
+        self.params["offset"] = start
+        self.params["limit"] = end - start + 1
+        return self
+
     def insert(self, data: Dict) -> 'QueryBuilder':
         """Insert data"""
         self.method = "POST"
@@ -143,6 +194,8 @@ class QueryBuilder:
         """Execute the query"""
         try:
             headers = self.client.get_headers(self.user_token)
+            if self.count:
+                headers["Prefer"] = f"count={self.count}"
 
             if self.method == "GET":
                 response = await self.client.client.get(
@@ -150,6 +203,12 @@ class QueryBuilder:
                     headers=headers,
                     params=self.params
                 )
+            elif self.method == "HEAD":
+                response = await self.client.client.head(
+                    self.url,
+                    headers=headers,
+                    params=self.params
+                )
             elif self.method == "POST":
                 # For upsert, add resolution header
                 post_headers = {**headers}
@@ -171,27 +230,45 @@ class QueryBuilder:
                     params=self.params,
                     json=self.body
                 )
+            elif self.method == "RPC":
+                response = await self.client.client.post(
+                    self.url,
+                    headers=headers,
+                    params=self.params,
+                    json=self.body
+                )
             elif self.method == "DELETE":
+                # With select(), return the deleted rows (lets callers scope and check a delete in one call)
+                delete_headers = {**headers, "Prefer": "return=representation"} if "select" in self.params else headers
                 response = await self.client.client.delete(
                     self.url,
-                    headers=headers,
+                    headers=delete_headers,
                     params=self.params
                 )
 
             response.raise_for_status()
 
+            if self.method == "HEAD":
+                return {"data": [], "count": self._parse_count(response), "error": None}
+
             if response.status_code == 204:
                 return {"data": [], "error": None}
 
             # Handle empty responses (common with upserts)
-            if not response.text or response.text.strip() == "":
+            if not response.content.strip():
                 print(f"[DEBUG] Empty response with status {response.status_code} - treating as success")
                 return {"data": [], "error": None}
 
             # Try to parse JSON
             try:
-                data = response.json()
-                return {"data": data if isinstance(data, list) else [data], "error": None}
+                data = orjson.loads(response.content)
+                if data is None:
+                    # Functions returning void/null
+                    return {"data": [], "error": None}
+                result = {"data": data if isinstance(data, list) else [data], "error": None}
+                if self.count:
+                    result["count"] = self._parse_count(response)
+                return result
             except Exception as json_err:
                 # If JSON parsing fails, return the raw text
                 print(f"[ERROR] JSON decode failed. Status: {response.status_code}")
@@ -207,6 +284,13 @@ class QueryBuilder:
             return {"data": [], "error": str(e)}
 
 
+    @staticmethod
+    def _parse_count(response: httpx.Response) -> Optional[int]:
+        """Read the total from a Content-Range header such as '0-24/3573' or '*/0'"""
+        total = response.headers.get("content-range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+
+
 # Global client instance
 supabase_client = SupabaseClient(SUPABASE_URL, SUPABASE_SECRET_KEY)
 